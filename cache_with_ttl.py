@@ -1,30 +1,144 @@
 # Hint: This is a leetcode question LRU with ttl(time to live)
+import asyncio
+import functools
+import gc
+import heapq
+import inspect
+import itertools
+import math
+import mmap
+import os
+import pickle
+import struct
+import threading
 import time
+from array import array
+from concurrent.futures import Future
 
 class ListNode:
-    def __init__(self, key, val, ttl):
+    __slots__ = ('key', 'val', 'expiry', 'prev', 'next')
+
+    def __init__(self, key, val, expiry=None):
         self.key = key
         self.val = val
-        self.expiry = time.time() + ttl if ttl else None
+        self.expiry = expiry  # absolute deadline from the cache clock, None = never expires
         self.prev = None
         self.next = None
 
+_HALVE = bytes(i >> 1 for i in range(256))
+
+
+class CountMinSketch:
+    # Frequency estimates in a fixed depth x width table of saturating byte
+    # counters. All counters are halved every sample_size increments so old
+    # popularity fades (TinyLFU aging). Estimates never undercount between resets.
+    MAX_COUNT = 15
+
+    def __init__(self, width: int, depth: int = 4):
+        self.bits = max(4, (max(width, 1) - 1).bit_length())
+        self.width = 1 << self.bits
+        self.depth = depth
+        self.table = bytearray(self.width * depth)
+        self.sample_size = 10 * self.width
+        self.additions = 0
+
+    def _indexes(self, key):
+        # One mixed 64-bit hash, rows picked by double hashing (h1 + row * h2).
+        h = (hash(key) * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        h ^= h >> 31
+        step = (h >> 32) | 1
+        width, mask = self.width, self.width - 1
+        return [row * width + ((h + row * step) & mask) for row in range(self.depth)]
+
+    def increment(self, key):
+        table = self.table
+        for i in self._indexes(key):
+            if table[i] < self.MAX_COUNT:
+                table[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.table = table.translate(_HALVE)
+            self.additions //= 2
+
+    def estimate(self, key) -> int:
+        table = self.table
+        return min(table[i] for i in self._indexes(key))
+
+
+class LRUPolicy:
+    # Plain LRU: admit every new key, evict from the LRU end while the cache
+    # holds more than `capacity` entries or, with a weigher, more than max_weight.
+    def __init__(self, max_weight=None, weigher=None):
+        self.max_weight = max_weight
+        self.weigher = weigher or (lambda key, value: 1)
+        self.weights = {}  # key -> weight, only tracked when max_weight is set
+        self.total_weight = 0
+
+    def on_access(self, key):
+        pass
+
+    def on_insert(self, node):
+        if self.max_weight is not None:
+            w = self.weights[node.key] = self.weigher(node.key, node.val)
+            self.total_weight += w
+
+    def on_remove(self, node):
+        if self.max_weight is not None:
+            self.total_weight -= self.weights.pop(node.key)
+
+    def over_capacity(self, cache) -> bool:
+        if len(cache.cache) > cache.cap:
+            return True
+        return self.max_weight is not None and self.total_weight > self.max_weight
+
+    def admit(self, candidate_key, victim_key) -> bool:
+        return True
+
+
+class TinyLFUPolicy(LRUPolicy):
+    # TinyLFU admission: every access bumps a count-min sketch and a new key
+    # only displaces the LRU victim if it has been seen more often, so a one-off
+    # scan of cold keys cannot flush the hot working set.
+    def __init__(self, capacity: int, max_weight=None, weigher=None, sketch_width=None):
+        super().__init__(max_weight, weigher)
+        # 4 counters per cached entry keeps collisions low for keys just outside the cache
+        self.sketch = CountMinSketch(sketch_width or 4 * capacity)
+
+    def on_access(self, key):
+        self.sketch.increment(key)
+
+    def admit(self, candidate_key, victim_key) -> bool:
+        return self.sketch.estimate(candidate_key) > self.sketch.estimate(victim_key)
+
+
 class LRUCache:
+    # Max expired entries reclaimed per get/put, keeps every call O(log n) amortized.
+    PURGE_BATCH = 8
 
-    def __init__(self, capacity: int):
+    def __init__(self, capacity: int, clock=time.time, policy=None):
         self.cap = capacity
+        self.clock = clock  # injectable so tests/benchmarks can drive time
+        self.policy = policy or LRUPolicy()
         self.cache = {}
-        self.left = ListNode(0, 0, 0)  # dummy head
-        self.right = ListNode(0, 0, 0) # dummy tail
+        self.left = ListNode(0, 0)  # dummy head
+        self.right = ListNode(0, 0) # dummy tail
         self.left.next = self.right
         self.right.prev = self.left
-    
+        # Min-heap of (expiry, seq, node). Entries whose node is no longer in
+        # the cache are stale and skipped lazily when they reach the top.
+        self.expiry_heap = []
+        self._seq = itertools.count()
+        # get_or_load bookkeeping: one in-flight load per key, shared by all waiters.
+        self._lock = threading.Lock()
+        self._inflight = {}   # key -> concurrent.futures.Future (threads)
+        self._ainflight = {}  # key -> asyncio.Task (coroutines)
+
     def _remove(self, node):
         prev = node.prev
         nxt = node.next
         prev.next = nxt
         nxt.prev = prev
-    
+
     def _insert(self, node):
         prev = self.right.prev
         node.next = self.right
@@ -32,37 +146,811 @@ class LRUCache:
         self.right.prev = node
         prev.next = node
 
-    def _is_expired(self, node):
-        return node.expiry is not None and time.time() > node.expiry
+    def _discard(self, node):
+        self._remove(node)
+        del self.cache[node.key]
+        self.policy.on_remove(node)
+
+    def _is_expired(self, node, now):
+        return node.expiry is not None and now > node.expiry
+
+    def _track_expiry(self, node):
+        heapq.heappush(self.expiry_heap, (node.expiry, next(self._seq), node))
+        # Overwrites leave stale heap entries behind, rebuild once they dominate.
+        if len(self.expiry_heap) > 2 * len(self.cache) + 64:
+            self.expiry_heap = [e for e in self.expiry_heap if self.cache.get(e[2].key) is e[2]]
+            heapq.heapify(self.expiry_heap)
+
+    def purge_expired(self, now=None, limit=None) -> int:
+        # Drop entries whose expiry has passed, soonest first. Returns how many were removed.
+        if now is None:
+            now = self.clock()
+        heap = self.expiry_heap
+        purged = 0
+        while heap and (limit is None or purged < limit):
+            expiry, _, node = heap[0]
+            if self.cache.get(node.key) is not node:
+                heapq.heappop(heap)  # stale: node was overwritten or already removed
+                continue
+            if now <= expiry:
+                break
+            heapq.heappop(heap)
+            self._discard(node)
+            purged += 1
+        return purged
+
+    def _lookup(self, key, now):
+        # Returns the live node for key (marking it most recently used) or None.
+        self.policy.on_access(key)
+        node = self.cache.get(key)
+        if node is None:
+            return None
+        if self._is_expired(node, now):
+            self._discard(node)
+            return None
+        self._remove(node)
+        self._insert(node)
+        return node
 
     def get(self, key: int) -> int:
-        if key in self.cache:
-            node = self.cache[key]
-            if self._is_expired(node):
-                self._remove(node)
-                del self.cache[key]
-                return -1
-            self._remove(node)
-            self._insert(node)
-            return node.val
-        return -1
+        now = self.clock()
+        self.purge_expired(now, self.PURGE_BATCH)
+        node = self._lookup(key, now)
+        return node.val if node is not None else -1
 
     def put(self, key: int, value: int, ttl: int = 0) -> None:
-        if key in self.cache:
-            self._remove(self.cache[key])
-            del self.cache[key]
-        
-        new_node = ListNode(key, value, ttl)
+        now = self.clock()
+        self.purge_expired(now, self.PURGE_BATCH)
+        self.policy.on_access(key)
+        old = self.cache.get(key)
+        if old is not None:
+            self._discard(old)
+
+        new_node = ListNode(key, value, now + ttl if ttl else None)
         self.cache[key] = new_node
         self._insert(new_node)
+        self.policy.on_insert(new_node)
+        if new_node.expiry is not None:
+            self._track_expiry(new_node)
+        self._evict(new_node if old is None else None, now)
 
-        # Cleanup LRU if over capacity
-        while len(self.cache) > self.cap:
+    def _evict(self, candidate, now):
+        # Cleanup LRU if over capacity. A newly added candidate must first win
+        # admission against the LRU victim, otherwise the candidate is dropped.
+        policy = self.policy
+        while policy.over_capacity(self):
             lru = self.left.next
-            if self._is_expired(lru):
-                self._remove(lru)
-                del self.cache[lru.key]
+            if (candidate is not None and lru is not candidate and not self._is_expired(lru, now)
+                    and not policy.admit(candidate.key, lru.key)):
+                self._discard(candidate)
+            else:
+                self._discard(lru)
+            candidate = None
+
+    def __len__(self):
+        return len(self.cache)
+
+    def get_many(self, keys):
+        # Batched get: one clock read, relinks inlined. Returns (values, hits, misses)
+        # with values in the caller's order and -1 for each miss, like get().
+        now = self.clock()
+        self.purge_expired(now, self.PURGE_BATCH)
+        cache = self.cache
+        tail = self.right
+        on_access = self.policy.on_access
+        values = []
+        hits = 0
+        for key in keys:
+            on_access(key)
+            node = cache.get(key)
+            if node is None:
+                values.append(-1)
+                continue
+            prev, nxt = node.prev, node.next
+            prev.next = nxt
+            nxt.prev = prev
+            if node.expiry is not None and now > node.expiry:
+                del cache[key]
+                self.policy.on_remove(node)
+                values.append(-1)
+                continue
+            prev = tail.prev
+            node.prev = prev
+            node.next = tail
+            prev.next = node
+            tail.prev = node
+            values.append(node.val)
+            hits += 1
+        return values, hits, len(values) - hits
+
+    def put_many(self, items, ttl: int = 0) -> None:
+        # Batched put of (key, value) pairs or a mapping, all sharing one ttl.
+        # Capacity is enforced once at the end, evicting from the LRU end
+        # without admission checks, so it also serves as a bulk warm-up path.
+        if hasattr(items, 'items'):
+            items = items.items()
+        now = self.clock()
+        self.purge_expired(now, self.PURGE_BATCH)
+        cache = self.cache
+        tail = self.right
+        policy = self.policy
+        expiry = now + ttl if ttl else None
+        for key, value in items:
+            policy.on_access(key)
+            old = cache.get(key)
+            if old is not None:
+                old.prev.next = old.next
+                old.next.prev = old.prev
+                policy.on_remove(old)
+            node = cache[key] = ListNode(key, value, expiry)
+            policy.on_insert(node)
+            prev = tail.prev
+            node.prev = prev
+            node.next = tail
+            prev.next = node
+            tail.prev = node
+            if expiry is not None:
+                self._track_expiry(node)
+        self._evict(None, now)
+
+    # Snapshot file: header (magic, version, wall-clock write time, capacity), then
+    # chunks of (count, pickled_len) + count float64 remaining TTLs + one pickled
+    # (keys, values) pair. Entries are written LRU first, inf = no expiry.
+    SNAPSHOT_MAGIC = b'LRUS'
+    SNAPSHOT_HEADER = struct.Struct('<4sHdQ')
+    SNAPSHOT_CHUNK = struct.Struct('<II')
+    SNAPSHOT_CHUNK_SIZE = 65536
+
+    def snapshot(self, path) -> int:
+        # Streams live entries to path, returns how many were written.
+        now = self.clock()
+        written = 0
+        with open(path, 'wb') as f:
+            f.write(self.SNAPSHOT_HEADER.pack(self.SNAPSHOT_MAGIC, 1, time.time(), self.cap))
+            node = self.left.next
+            while node is not self.right:
+                ttls, keys, vals = array('d'), [], []
+                while node is not self.right and len(keys) < self.SNAPSHOT_CHUNK_SIZE:
+                    if node.expiry is None:
+                        ttls.append(math.inf)
+                    elif node.expiry >= now:
+                        ttls.append(node.expiry - now)
+                    else:
+                        node = node.next
+                        continue
+                    keys.append(node.key)
+                    vals.append(node.val)
+                    node = node.next
+                if not keys:
+                    break
+                blob = pickle.dumps((keys, vals), pickle.HIGHEST_PROTOCOL)
+                f.write(self.SNAPSHOT_CHUNK.pack(len(keys), len(blob)))
+                f.write(ttls.tobytes())
+                f.write(blob)
+                written += len(keys)
+        return written
+
+    @classmethod
+    def load(cls, path, capacity=None, clock=time.time, policy=None):
+        # Rebuilds a cache from snapshot(), one memory-mapped chunk at a time.
+        # Time spent between the snapshot and now counts against each TTL, so
+        # entries that expired while the process was down are dropped.
+        with open(path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size < cls.SNAPSHOT_HEADER.size:
+                raise ValueError(f"{path} is not an LRUCache snapshot")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                magic, version, written_at, saved_cap = cls.SNAPSHOT_HEADER.unpack_from(mm, 0)
+                if magic != cls.SNAPSHOT_MAGIC or version != 1:
+                    raise ValueError(f"{path} is not an LRUCache snapshot")
+                cache = cls(saved_cap if capacity is None else capacity, clock, policy)
+                now = cache.clock()
+                downtime = max(0.0, time.time() - written_at)
+                offset = cls.SNAPSHOT_HEADER.size
+                # Millions of fresh nodes would trigger repeated full GC passes
+                # that find nothing to collect, pause the collector meanwhile.
+                gc_enabled = gc.isenabled()
+                gc.disable()
+                try:
+                    while offset < len(mm):
+                        count, blob_len = cls.SNAPSHOT_CHUNK.unpack_from(mm, offset)
+                        offset += cls.SNAPSHOT_CHUNK.size
+                        ttls = array('d')
+                        ttls.frombytes(mm[offset:offset + 8 * count])
+                        offset += 8 * count
+                        keys, vals = pickle.loads(mm[offset:offset + blob_len])
+                        offset += blob_len
+                        cache._restore_chunk(keys, vals, ttls, now, downtime)
+                finally:
+                    if gc_enabled:
+                        gc.enable()
+        heapq.heapify(cache.expiry_heap)
+        return cache
+
+    def _restore_chunk(self, keys, vals, ttls, now, downtime):
+        # Appends one snapshot chunk at the MRU end. The expiry heap is only
+        # appended to here, load() heapifies it once at the end.
+        cache = self.cache
+        tail = self.right
+        heap = self.expiry_heap
+        seq = self._seq
+        on_insert = self.policy.on_insert
+        for key, val, ttl in zip(keys, vals, ttls):
+            if ttl == math.inf:
+                expiry = None
             else:
-                self._remove(lru)
-                del self.cache[lru.key]
+                remaining = ttl - downtime
+                if remaining <= 0:
+                    continue
+                expiry = now + remaining
+            old = cache.get(key)
+            if old is not None:
+                self._discard(old)
+            node = cache[key] = ListNode(key, val, expiry)
+            prev = tail.prev
+            node.prev = prev
+            node.next = tail
+            prev.next = node
+            tail.prev = node
+            on_insert(node)
+            if expiry is not None:
+                heap.append((expiry, next(seq), node))
+        while self.policy.over_capacity(self):
+            self._discard(self.left.next)
+
+    # get_or_load/aget_or_load serialize their own cache access on self._lock.
+    # Plain get/put stay lock-free, so callers mixing them across threads still
+    # need their own locking (or a ShardedLRUCache).
+    def _hit(self, key, now, refresh_ahead):
+        # Returns (node, should_refresh) for a cached key, node is None on a miss.
+        self.purge_expired(now, self.PURGE_BATCH)
+        node = self._lookup(key, now)
+        if node is None:
+            return None, False
+        stale = bool(refresh_ahead) and node.expiry is not None and node.expiry - now <= refresh_ahead
+        return node, stale
+
+    def get_or_load(self, key, loader, ttl: int = 0, refresh_ahead: float = 0):
+        # Returns the cached value, or calls loader() once no matter how many
+        # threads miss on key at the same time. With refresh_ahead > 0, a hit
+        # within refresh_ahead seconds of expiry returns the current value and
+        # reloads it on a background thread (stale-while-revalidate).
+        with self._lock:
+            node, stale = self._hit(key, self.clock(), refresh_ahead)
+            fut = self._inflight.get(key)
+            if node is not None:
+                if stale and fut is None:
+                    fut = self._inflight[key] = Future()
+                    threading.Thread(target=self._load, args=(key, loader, ttl, fut), daemon=True).start()
+                return node.val
+            leader = fut is None
+            if leader:
+                fut = self._inflight[key] = Future()
+        if leader:
+            self._load(key, loader, ttl, fut)
+        return fut.result()
+
+    def _load(self, key, loader, ttl, fut):
+        try:
+            value = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            fut.set_exception(e)  # waiters re-raise, nothing is cached
+            return
+        with self._lock:
+            self.put(key, value, ttl)
+            self._inflight.pop(key, None)
+        fut.set_result(value)
+
+    async def aget_or_load(self, key, loader, ttl: int = 0, refresh_ahead: float = 0):
+        # asyncio flavour of get_or_load, loader is a coroutine function.
+        with self._lock:
+            node, stale = self._hit(key, self.clock(), refresh_ahead)
+            task = self._ainflight.get(key)
+            if node is not None:
+                if stale and task is None:
+                    self._ainflight[key] = asyncio.ensure_future(self._aload(key, loader, ttl))
+                return node.val
+            if task is None:
+                task = self._ainflight[key] = asyncio.ensure_future(self._aload(key, loader, ttl))
+        # shield: one waiter being cancelled must not cancel the shared load
+        return await asyncio.shield(task)
+
+    async def _aload(self, key, loader, ttl):
+        try:
+            value = await loader()
+            with self._lock:
+                self.put(key, value, ttl)
+            return value
+        finally:
+            with self._lock:
+                self._ainflight.pop(key, None)
+
+
+def cached(cache, ttl: int = 0, refresh_ahead: float = 0):
+    # Memoize a function (sync or async) through cache.get_or_load, keyed on its arguments.
+    def decorator(fn):
+        def make_key(args, kwargs):
+            return (fn.__qualname__, args, tuple(sorted(kwargs.items())))
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await cache.aget_or_load(make_key(args, kwargs), lambda: fn(*args, **kwargs), ttl, refresh_ahead)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return cache.get_or_load(make_key(args, kwargs), lambda: fn(*args, **kwargs), ttl, refresh_ahead)
+        return wrapper
+    return decorator
+
+
+class CompactLRUCache:
+    # Same LRU/TTL semantics as LRUCache, but prev/next/expiry live in
+    # preallocated parallel arrays indexed by slot number instead of one
+    # object per entry. Slot 0 is the dummy head, slot 1 the dummy tail.
+    # Keys are found through an open-addressed table of slot numbers rather
+    # than a dict, since a dict would hold a separate int object per entry
+    # for its slot and cost as much as LRUCache's nodes. Lookups probe in
+    # Python, so this trades some speed for memory.
+    PURGE_BATCH = LRUCache.PURGE_BATCH
+    HEAD, TAIL = 0, 1
+    SLOT_BITS = 32
+    EMPTY, DELETED = -1, -2  # table markers, anything else is a slot
+
+    def __init__(self, capacity: int, clock=time.time):
+        self.cap = capacity
+        self.clock = clock
+        size = max(capacity, 0) + 2
+        self.prev = array('q', [0]) * size
+        self.next = array('q', [0]) * size  # doubles as the free-list link for unused slots
+        self.expiry = array('d', [math.inf]) * size  # inf = never expires
+        self.hashes = array('q', [0]) * size
+        self.keys = [None] * size
+        self.vals = [None] * size
+        self.used = bytearray(size)
+        # Hash table of slots, kept at most half full of live entries.
+        self.mask = (1 << (2 * size - 1).bit_length()) - 1
+        self.table = array('q', [self.EMPTY]) * (self.mask + 1)
+        self.count = 0   # live entries
+        self.filled = 0  # live entries + DELETED markers
+        self.free_head = -1  # released slots, linked through self.next
+        self.high_water = 2  # slots >= high_water have never been handed out
+        self.next[self.HEAD] = self.TAIL
+        self.prev[self.TAIL] = self.HEAD
+        # Min-heap of ints packing (expiry in microseconds, slot): one int per
+        # entry instead of a tuple + float. Stale once the slot's expiry changes.
+        self.expiry_heap = []
+
+    def _probe(self, h):
+        # Table positions to try for hash h, same recurrence as CPython's dict.
+        mask = self.mask
+        perturb = h & 0x7FFFFFFFFFFFFFFF
+        i = h & mask
+        while True:
+            yield i
+            perturb >>= 5
+            i = (5 * i + 1 + perturb) & mask
+
+    def _find(self, key):
+        # Slot holding key, or -1.
+        h = hash(key)
+        table, hashes, keys = self.table, self.hashes, self.keys
+        for i in self._probe(h):
+            slot = table[i]
+            if slot == self.EMPTY:
+                return -1
+            if slot >= 0 and hashes[slot] == h and (keys[slot] is key or keys[slot] == key):
+                return slot
+
+    def _link(self, slot):
+        # Put slot into the table under self.hashes[slot].
+        table = self.table
+        for i in self._probe(self.hashes[slot]):
+            if table[i] < 0:
+                if table[i] == self.EMPTY:
+                    self.filled += 1
+                table[i] = slot
                 break
+        self.count += 1
+        if self.filled > (self.mask + 1) * 3 // 4:
+            self._rebuild()
+
+    def _unlink(self, slot):
+        table = self.table
+        for i in self._probe(self.hashes[slot]):
+            if table[i] == slot:
+                table[i] = self.DELETED
+                break
+        self.count -= 1
+
+    def _rebuild(self):
+        # Clear DELETED markers; live entries never exceed half the table.
+        self.table = array('q', [self.EMPTY]) * (self.mask + 1)
+        self.count = self.filled = 0
+        for slot in range(2, self.high_water):
+            if self.used[slot]:
+                self._link(slot)
+
+    def _remove(self, slot):
+        p, n = self.prev[slot], self.next[slot]
+        self.next[p] = n
+        self.prev[n] = p
+
+    def _insert(self, slot):
+        p = self.prev[self.TAIL]
+        self.next[slot] = self.TAIL
+        self.prev[slot] = p
+        self.prev[self.TAIL] = slot
+        self.next[p] = slot
+
+    def _alloc(self):
+        if self.free_head != -1:
+            slot = self.free_head
+            self.free_head = self.next[slot]
+            return slot
+        if self.high_water < len(self.used):
+            self.high_water += 1
+            return self.high_water - 1
+        return -1
+
+    def _release(self, slot):
+        self._remove(slot)
+        self._unlink(slot)
+        self.keys[slot] = self.vals[slot] = None
+        self.expiry[slot] = math.inf
+        self.used[slot] = 0
+        self.next[slot] = self.free_head
+        self.free_head = slot
+
+    def _heap_key(self, slot):
+        return (int(self.expiry[slot] * 1_000_000) << self.SLOT_BITS) | slot
+
+    def purge_expired(self, now=None, limit=None) -> int:
+        if now is None:
+            now = self.clock()
+        heap = self.expiry_heap
+        mask = (1 << self.SLOT_BITS) - 1
+        purged = 0
+        while heap and (limit is None or purged < limit):
+            slot = heap[0] & mask
+            if not self.used[slot] or self.expiry[slot] == math.inf or self._heap_key(slot) != heap[0]:
+                heapq.heappop(heap)  # stale: slot was freed or rewritten
+                continue
+            if now <= self.expiry[slot]:
+                break
+            heapq.heappop(heap)
+            self._release(slot)
+            purged += 1
+        return purged
+
+    def get(self, key):
+        now = self.clock()
+        self.purge_expired(now, self.PURGE_BATCH)
+        slot = self._find(key)
+        if slot == -1:
+            return -1
+        if now > self.expiry[slot]:
+            self._release(slot)
+            return -1
+        self._remove(slot)
+        self._insert(slot)
+        return self.vals[slot]
+
+    def put(self, key, value, ttl: int = 0) -> None:
+        now = self.clock()
+        self.purge_expired(now, self.PURGE_BATCH)
+        slot = self._find(key)
+        if slot != -1:
+            self._release(slot)
+        if self.cap <= 0:
+            return
+        slot = self._alloc()
+        if slot == -1:
+            self._release(self.next[self.HEAD])  # evict LRU to make room
+            slot = self._alloc()
+        self.keys[slot] = key
+        self.vals[slot] = value
+        self.used[slot] = 1
+        self.hashes[slot] = hash(key)
+        self._link(slot)
+        self._insert(slot)
+        if ttl:
+            self.expiry[slot] = now + ttl
+            heapq.heappush(self.expiry_heap, self._heap_key(slot))
+            if len(self.expiry_heap) > 2 * self.count + 64:
+                mask = (1 << self.SLOT_BITS) - 1
+                self.expiry_heap = [h for h in self.expiry_heap
+                                    if self.used[h & mask] and self._heap_key(h & mask) == h]
+                heapq.heapify(self.expiry_heap)
+
+    def __len__(self):
+        return self.count
+
+
+class ShardedLRUCache:
+    # Hashes keys across independent LRU+TTL shards, each behind its own lock,
+    # so threads touching different shards never wait on each other.
+    def __init__(self, capacity: int, num_shards: int = 16, clock=time.time, cache_cls=LRUCache):
+        if capacity < num_shards:
+            raise ValueError(f"capacity {capacity} is less than one slot per shard ({num_shards} shards)")
+        self.num_shards = num_shards
+        # The first capacity % num_shards shards take one extra slot, so the
+        # shards hold exactly capacity entries between them.
+        per_shard, extra = divmod(capacity, num_shards)
+        self.shards = [cache_cls(per_shard + (i < extra), clock) for i in range(num_shards)]
+        self.locks = [threading.Lock() for _ in range(num_shards)]
+
+    def _shard(self, key):
+        return hash(key) % self.num_shards
+
+    def get(self, key):
+        i = self._shard(key)
+        with self.locks[i]:
+            return self.shards[i].get(key)
+
+    def put(self, key, value, ttl: int = 0) -> None:
+        i = self._shard(key)
+        with self.locks[i]:
+            self.shards[i].put(key, value, ttl)
+
+    def purge_expired(self) -> int:
+        purged = 0
+        for lock, shard in zip(self.locks, self.shards):
+            with lock:
+                purged += shard.purge_expired()
+        return purged
+
+    def __len__(self):
+        return sum(len(shard) for shard in self.shards)
+
+
+def benchmark_threads(thread_counts=(1, 4, 16, 64), ops_per_thread=20000, capacity=10000):
+    # Single global lock (one shard) vs ShardedLRUCache, 80% get / 20% put mix.
+    import random
+
+    def run(cache, n_threads):
+        def worker(seed):
+            rnd = random.Random(seed)
+            keys = [rnd.randrange(capacity * 2) for _ in range(ops_per_thread)]
+            for i, k in enumerate(keys):
+                if i % 5 == 0:
+                    cache.put(k, k, 60)
+                else:
+                    cache.get(k)
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return n_threads * ops_per_thread / (time.perf_counter() - start)
+
+    for n in thread_counts:
+        locked = run(ShardedLRUCache(capacity, num_shards=1), n)
+        sharded = run(ShardedLRUCache(capacity, num_shards=16), n)
+        print(f"threads={n:3d}  locked LRUCache: {locked:12,.0f} ops/s  sharded: {sharded:12,.0f} ops/s")
+
+
+def benchmark_memory(n=200000):
+    # Bytes per entry (excluding key and payload objects) for each storage mode.
+    import tracemalloc
+
+    keys = list(range(n))  # allocated up front so they are not charged to the cache
+    for ttl in (0, 60):
+        for cls in (LRUCache, CompactLRUCache):
+            tracemalloc.start()
+            cache = cls(n, clock=lambda: 0.0)
+            for k in keys:
+                cache.put(k, None, ttl)
+            used = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            print(f"ttl={ttl:<3d} {cls.__name__:16s} {used / n:8.1f} bytes/entry")
+            del cache
+
+def benchmark_batch(batch=200, rounds=2000, capacity=100000):
+    # Per-key cost of looping get/put vs get_many/put_many.
+    import random
+
+    rnd = random.Random(7)
+    batches = [[rnd.randrange(capacity) for _ in range(batch)] for _ in range(rounds)]
+    for name, run in (
+        ("loop put", lambda c, ks: [c.put(k, k, 60) for k in ks]),
+        ("put_many", lambda c, ks: c.put_many([(k, k) for k in ks], 60)),
+        ("loop get", lambda c, ks: [c.get(k) for k in ks]),
+        ("get_many", lambda c, ks: c.get_many(ks)),
+    ):
+        cache = LRUCache(capacity)
+        cache.put_many((k, k) for k in range(capacity))
+        start = time.perf_counter()
+        for ks in batches:
+            run(cache, ks)
+        elapsed = time.perf_counter() - start
+        print(f"{name:9s} {elapsed / (batch * rounds) * 1e9:8.1f} ns/key")
+
+
+def benchmark_policies(capacity=1000, trace_len=200000):
+    # Replays a Zipf trace with periodic one-off scans through each policy,
+    # reporting hit ratio and ops/sec.
+    import random
+
+    rnd = random.Random(42)
+    universe = capacity * 20
+    cum, total = [], 0.0
+    for rank in range(1, universe + 1):
+        total += 1.0 / rank
+        cum.append(total)
+    trace = rnd.choices(range(universe), cum_weights=cum, k=trace_len)
+    scan_start = universe
+    for pos in range(trace_len // 10, trace_len, trace_len // 5):
+        trace[pos:pos] = range(scan_start, scan_start + capacity * 2)  # cold scan
+        scan_start += capacity * 2
+    sizes = {k: 10 if k % 10 else 1000 for k in range(scan_start)}
+    avg = sum(sizes[k] for k in range(universe)) / universe
+
+    policies = (
+        ("LRU", lambda: LRUPolicy()),
+        ("TinyLFU", lambda: TinyLFUPolicy(capacity)),
+        ("LRU weighted", lambda: LRUPolicy(capacity * avg, lambda k, v: v)),
+        ("TinyLFU weighted", lambda: TinyLFUPolicy(capacity, capacity * avg, lambda k, v: v)),
+    )
+    for name, make in policies:
+        cache = LRUCache(len(sizes), policy=make()) if "weighted" in name else LRUCache(capacity, policy=make())
+        hits = 0
+        start = time.perf_counter()
+        for key in trace:
+            if cache.get(key) != -1:
+                hits += 1
+            else:
+                cache.put(key, sizes[key])
+        elapsed = time.perf_counter() - start
+        print(f"{name:17s} hit ratio {hits / len(trace):6.1%}  {len(trace) / elapsed:12,.0f} ops/s")
+
+
+def benchmark_snapshot(n=1000000):
+    # Write and reload time for an n-entry snapshot.
+    import tempfile
+
+    cache = LRUCache(n)
+    cache.put_many(((i, f"value-{i}") for i in range(n)), ttl=3600)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.snap")
+        start = time.perf_counter()
+        cache.snapshot(path)
+        written = time.perf_counter() - start
+        size = os.path.getsize(path)
+        start = time.perf_counter()
+        loaded = LRUCache.load(path)
+        elapsed = time.perf_counter() - start
+    assert len(loaded.cache) == n
+    print(f"snapshot {n:,} entries: write {written:.2f}s, load {elapsed:.2f}s, "
+          f"{size / n:.1f} bytes/entry on disk")
+
+
+# --- Demo / Test ---
+if __name__ == "__main__":
+    now = [0.0]
+    cache = LRUCache(100, clock=lambda: now[0])
+    for i in range(50):
+        cache.put(i, i, ttl=10)
+    cache.put("sticky", 1)
+    now[0] = 11
+    assert cache.purge_expired() == 50  # reclaimed without waiting for capacity pressure
+    assert len(cache.cache) == 1 and cache.get("sticky") == 1
+
+    sharded = ShardedLRUCache(64, num_shards=4, clock=lambda: now[0])
+    for i in range(64):
+        sharded.put(i, i, ttl=5)
+    assert all(sharded.get(i) == i for i in range(64))
+    now[0] = 20
+    assert sharded.purge_expired() == 64 and len(sharded) == 0
+    assert [shard.cap for shard in ShardedLRUCache(10, num_shards=4).shards] == [3, 3, 2, 2]
+    assert sum(shard.cap for shard in ShardedLRUCache(100, num_shards=16, cache_cls=CompactLRUCache).shards) == 100
+
+    compact = CompactLRUCache(2, clock=lambda: now[0])
+    compact.put("a", 1, ttl=5)
+    compact.put("b", 2)
+    compact.get("a")
+    compact.put("c", 3)  # evicts "b", the least recently used
+    assert compact.get("b") == -1 and compact.get("a") == 1
+    now[0] = 30
+    assert compact.get("a") == -1 and compact.get("c") == 3
+
+    # Churn through a small cache: the slot table stays consistent as entries
+    # are evicted, overwritten and expire.
+    churn = CompactLRUCache(50, clock=lambda: now[0])
+    shadow = LRUCache(50, clock=lambda: now[0])
+    for i in range(5000):
+        key = (i * 7919) % 120
+        for cache in (churn, shadow):
+            cache.put(key, i, ttl=i % 3)
+        if i % 11 == 0:
+            now[0] += 1
+        probe = (i * 31) % 120
+        assert churn.get(probe) == shadow.get(probe)
+    assert len(churn) == len(shadow)
+
+    # Thundering herd: 32 threads miss on the same key, the loader runs once.
+    calls = []
+
+    @cached(LRUCache(10), ttl=60)
+    def expensive(x):
+        calls.append(x)
+        time.sleep(0.05)
+        return x * 2
+
+    workers = [threading.Thread(target=expensive, args=(21,)) for _ in range(32)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert calls == [21] and expensive(21) == 42
+
+    async def herd():
+        acalls = []
+
+        @cached(LRUCache(10), ttl=60)
+        async def fetch(x):
+            acalls.append(x)
+            await asyncio.sleep(0.01)
+            return x + 1
+
+        results = await asyncio.gather(*(fetch(1) for _ in range(100)))
+        assert results == [2] * 100 and acalls == [1]
+    asyncio.run(herd())
+
+    # Refresh ahead: a hit close to expiry returns the old value and reloads in the background.
+    loading = LRUCache(10, clock=lambda: now[0])
+    now[0] = 100
+    version = iter(range(1, 100))
+    assert loading.get_or_load("k", lambda: next(version), ttl=10, refresh_ahead=2) == 1
+    now[0] = 109
+    assert loading.get_or_load("k", lambda: next(version), ttl=10, refresh_ahead=2) == 1
+    refresh = loading._inflight.get("k")
+    if refresh is not None:
+        refresh.result(timeout=1)
+    assert loading.get("k") == 2
+
+    batched = LRUCache(3, clock=lambda: now[0])
+    batched.put_many({"x": 1, "y": 2, "z": 3}, ttl=5)
+    batched.put_many([("w", 4)])  # evicts "x"
+    assert batched.get_many(["z", "x", "w"]) == ([3, -1, 4], 2, 1)
+    now[0] += 10
+    assert batched.get_many(["y", "z", "w"]) == ([-1, -1, 4], 1, 2)
+
+    # A scan of cold keys does not flush frequently used keys under TinyLFU.
+    lfu = LRUCache(4, policy=TinyLFUPolicy(4, sketch_width=512))
+    for _ in range(3):
+        for k in "abcd":
+            lfu.put(k, k) if lfu.get(k) == -1 else None
+    for cold in range(100):
+        lfu.put(cold, cold)
+    assert all(lfu.get(k) == k for k in "abcd")
+
+    weighted = LRUCache(100, policy=LRUPolicy(max_weight=10, weigher=lambda k, v: len(v)))
+    weighted.put("small", "x" * 4)
+    weighted.put("big", "x" * 8)  # 12 > 10, evicts "small"
+    assert weighted.get("small") == -1 and weighted.policy.total_weight == 8
+
+    # Warm restart: LRU order and remaining TTLs survive, expired entries are dropped.
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        snap = os.path.join(tmp, "cache.snap")
+        warm = LRUCache(3, clock=lambda: now[0])
+        warm.put("short", 1, ttl=1e-9)
+        warm.put("a", 1)
+        warm.put("b", 2, ttl=3600)
+        warm.get("a")
+        assert warm.snapshot(snap) == 3
+        restored = LRUCache.load(snap, clock=lambda: now[0])
+        assert list(restored.cache) == ["b", "a"]
+        restored.put("c", 3)
+        restored.put("d", 4)  # evicts "b", the least recently used after restore
+        assert restored.get("b") == -1 and restored.get("a") == 1
+
+    benchmark_threads()
+    benchmark_memory()
+    benchmark_batch()
+    benchmark_policies()
+    benchmark_snapshot()
@@ -1,33 +1,129 @@
 from enum import Enum
 from collections import deque
+from bisect import bisect_left, bisect_right
+import heapq
+import math
+import random
 
 class Direction(Enum):
     up = 1
     down = 2
     idel = 3
 
+# Request schedulers: decide which pending floor an elevator heads to next.
+# add() ignores floors that are already pending, served() is called on arrival.
+class FIFOScheduler:
+    # Serve floors strictly in the order they were requested.
+    def __init__(self):
+        self.queue = deque()
+        self.pending = set()  # O(1) dedup instead of scanning the queue
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, floor, elevator):
+        if floor not in self.pending:
+            self.pending.add(floor)
+            self.queue.append(floor)
+
+    def next_stop(self, elevator):
+        return self.queue[0] if self.queue else None
+
+    def served(self, floor):
+        self.queue.popleft()
+        self.pending.discard(floor)
+
+    def eta(self, elevator, floor, stop_time):
+        # Ticks until the car would reach `floor` if it were appended now.
+        t, pos = 0, elevator.current_floor
+        for stop in self.queue:
+            if stop == floor:
+                return t + abs(stop - pos)
+            t += abs(stop - pos) + stop_time
+            pos = stop
+        return t + abs(floor - pos)
+
+class LookScheduler:
+    # LOOK: keep moving in the current direction, stopping at every pending
+    # floor on the way, and turn around only when nothing is left ahead.
+    # Floors above the car sit in a min-heap, floors below in a max-heap, so
+    # each add is O(log n). A car moving up never passes a floor in the down
+    # heap (and vice versa), so every floor stays on the correct side of the car.
+    def __init__(self):
+        self.up = []      # floors above the car, nearest first
+        self.down = []    # negated floors below the car, nearest first
+        self.pending = set()
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, floor, elevator):
+        if floor in self.pending:
+            return
+        self.pending.add(floor)
+        if floor > elevator.current_floor or (floor == elevator.current_floor
+                                              and elevator.direction != Direction.down):
+            heapq.heappush(self.up, floor)
+        else:
+            heapq.heappush(self.down, -floor)
+
+    def next_stop(self, elevator):
+        if elevator.direction == Direction.down:
+            if self.down:
+                return -self.down[0]
+            return self.up[0] if self.up else None
+        if self.up:
+            return self.up[0]
+        return -self.down[0] if self.down else None
+
+    def served(self, floor):
+        if self.up and self.up[0] == floor:
+            heapq.heappop(self.up)
+        else:
+            heapq.heappop(self.down)
+        self.pending.discard(floor)
+
+    def eta(self, elevator, floor, stop_time):
+        # Ticks until the car would reach `floor` on its LOOK sweep.
+        cur = elevator.current_floor
+        going_up = elevator.direction == Direction.up or (
+            elevator.direction == Direction.idel and (self.up or not self.down))
+        if going_up:
+            if floor >= cur:
+                return floor - cur + stop_time * sum(cur <= f < floor for f in self.up)
+            top = max(self.up, default=cur)
+            below = sum(floor < -f for f in self.down)
+            return (top - cur) + (top - floor) + stop_time * (len(self.up) + below)
+        if floor <= cur:
+            return cur - floor + stop_time * sum(floor < -f <= cur for f in self.down)
+        bottom = -max(self.down, default=-cur)
+        above = sum(f < floor for f in self.up)
+        return (cur - bottom) + (floor - bottom) + stop_time * (len(self.down) + above)
+
 class Elevator:
-    def __init__(self, eid):
+    def __init__(self, eid, scheduler=None):
         self.id = eid
         self.current_floor = 0
         self.direction = Direction.idel
-        self.request_queue  = deque()
+        self.request_queue  = scheduler if scheduler is not None else FIFOScheduler()
 
     def add_request(self, floor):
-        if floor not in self.request_queue:
-            self.request_queue.append(floor)
+        self.request_queue.add(floor, self)
     
     def next_request(self):
-        return self.request_queue[0] if self.request_queue else None
+        return self.request_queue.next_stop(self)
 
 # Simulated PhysicalElevator interface provided by the company
 class PhysicalElevator:
+    def __init__(self, log=print):
+        self.log = log
+
     def startmovingup(self, elevator):
-        print(f"lift {elevator.id} moving up, current {elevator.current_floor} floor")
+        self.log(f"lift {elevator.id} moving up, current {elevator.current_floor} floor")
         elevator.current_floor += 1
     
     def startmovingdown(self, elevator):
-        print(f"lift {elevator.id} moving down, current {elevator.current_floor} floor")
+        self.log(f"lift {elevator.id} moving down, current {elevator.current_floor} floor")
         elevator.current_floor -= 1
     
     def isApprochingFloor(self, elevator, floor):
@@ -35,14 +131,20 @@ class PhysicalElevator:
 
 # Main controller class that moves elevators toward their destinations
 class ElevatorEventHandler:
-    def __init__(self, elevators, physical_elevator):
+    def __init__(self, elevators, physical_elevator, log=print, on_arrival=None, on_move=None):
         self.elevators = elevators
         self.physical = physical_elevator
+        self.log = log
+        self.on_arrival = on_arrival  # optional callback(elevator, floor)
+        self.on_move = on_move  # optional callback(elevator) after its floor, direction or stops change
 
     def handle_requests(self):
         for elevator in self.elevators:
             if not elevator.request_queue:
-                elevator.direction = Direction.idel
+                if elevator.direction != Direction.idel:
+                    elevator.direction = Direction.idel
+                    if self.on_move:
+                        self.on_move(elevator)
                 continue
 
             next_floor = elevator.next_request()
@@ -57,34 +159,194 @@ class ElevatorEventHandler:
 
             # If already at the requested floor, serve it
             else:
-                print(f"Elevator {elevator.id} arrived at floor {next_floor}")
-                elevator.request_queue.popleft()  # Remove the request
-                elevator.direction = Direction.idel
+                self.log(f"Elevator {elevator.id} arrived at floor {next_floor}")
+                elevator.request_queue.served(next_floor)  # Remove the request
+                # Keep the direction while stops remain, LOOK sweeps on from here
+                if not elevator.request_queue:
+                    elevator.direction = Direction.idel
+                if self.on_arrival:
+                    self.on_arrival(elevator, next_floor)
+            if self.on_move:
+                self.on_move(elevator)
+
+# Dispatchers: pick which elevator answers a hall call.
+class ShortestQueueDispatcher:
+    # The car with the fewest pending requests, O(elevators) per call.
+    def pick(self, elevators, floor):
+        return min(elevators, key = lambda e: len(e.request_queue))
+
+    def on_step(self):
+        pass
+
+    def on_move(self, elevator):
+        pass
+
+class ETADispatcher:
+    # The car with the lowest estimated time-to-arrival, given its floor,
+    # direction and pending stops. Candidates come from an index of cars sorted
+    # by floor per direction, so only the nearest idle cars, the nearest cars
+    # already heading towards the floor, are costed. The index is built on the
+    # first pick, after that only the cars reported through on_move are
+    # re-filed, each with a bisect.
+    def __init__(self, stop_time=1, neighbors=2):
+        self.stop_time = stop_time
+        self.neighbors = neighbors
+        self.index = None  # direction -> (sorted (floor, id), cars in the same order)
+        self.placed = {}   # car id -> (direction, floor, index entry) it is filed under
+        self.moved = set()  # cars reported by on_move since the last pick
+
+    def on_step(self):
+        pass
+
+    def on_move(self, elevator):
+        # Called whenever a car's floor, direction or idleness may have changed.
+        self.moved.add(elevator)
+
+    def _place(self, e):
+        direction = e.direction if e.request_queue else Direction.idel
+        floor = e.current_floor
+        old = self.placed.get(e.id)
+        if old is not None:
+            if old[1] == floor and old[0] is direction:
+                return
+            keys, cars = old[2]
+            i = bisect_left(keys, (old[1], e.id))
+            del keys[i], cars[i]
+        lists = self.index[direction]
+        self.placed[e.id] = (direction, floor, lists)
+        keys, cars = lists
+        i = bisect_left(keys, (floor, e.id))
+        keys.insert(i, (floor, e.id))
+        cars.insert(i, e)
+
+    def pick(self, elevators, floor):
+        if self.index is None:
+            self.index = {direction: ([], []) for direction in Direction}
+            self.moved.update(elevators)
+        if self.moved:
+            for e in self.moved:
+                self._place(e)
+            self.moved.clear()
+        k = self.neighbors
+        candidates = []
+        keys, cars = self.index[Direction.idel]
+        i = bisect_left(keys, (floor,))
+        candidates += cars[max(0, i - k):i + k]
+        keys, cars = self.index[Direction.up]  # below the floor, moving up towards it
+        i = bisect_right(keys, (floor, math.inf))
+        candidates += cars[max(0, i - k):i]
+        keys, cars = self.index[Direction.down]  # above the floor, moving down towards it
+        i = bisect_left(keys, (floor,))
+        candidates += cars[i:i + k]
+        if not candidates:
+            candidates = elevators  # every car is heading away, cost them all
+        return min(candidates, key=lambda e: e.request_queue.eta(e, floor, self.stop_time))
 
 class ElevatorSystem:
-    def __init__(self, num_elevator):
-        self.elevators = [Elevator(eid) for eid in range(num_elevator)]
-        self.physical = PhysicalElevator()
-        self.handler = ElevatorEventHandler(self.elevators, self.physical)
+    # scheduler: request scheduler class used by every elevator
+    # dispatcher: picks the elevator for each hall call (default: shortest queue)
+    def __init__(self, num_elevator, scheduler=FIFOScheduler, log=print, on_arrival=None, dispatcher=None):
+        self.elevators = [Elevator(eid, scheduler()) for eid in range(num_elevator)]
+        self.log = log
+        self.physical = PhysicalElevator(log)
+        self.dispatcher = dispatcher if dispatcher is not None else ShortestQueueDispatcher()
+        self.handler = ElevatorEventHandler(self.elevators, self.physical, log, on_arrival, self.dispatcher.on_move)
 
     # This simulates a user pressing a button at floor X.
     def request_elevator(self, floor):
-        best = min(self.elevators, key = lambda e: len(e.request_queue))
+        best = self.dispatcher.pick(self.elevators, floor)
         best.add_request(floor)
-        print(f"Request for floor {floor} assigned to Elevator {best.id}")
+        self.log(f"Request for floor {floor} assigned to Elevator {best.id}")
+        return best
 
     # Moves each elevator one unit of time forward, based on its direction and next request.
     def step(self):
         # Move all elevators by one "step" based on their state
         self.handler.handle_requests()
+        self.dispatcher.on_step()
+
+
+def simulate_traffic(system, floors, ticks, rate, seed=0):
+    # Passengers press a hall button (wait = until the car arrives), then ride to
+    # a random destination (travel = until the car reaches it). `rate` is the
+    # mean number of new passengers per tick. Returns (avg wait, avg travel).
+    rnd = random.Random(seed)
+    waiting = {}  # (elevator id, floor) -> [(request tick, destination)]
+    riding = {}   # (elevator id, floor) -> [board tick]
+    waits, travels = [], []
+    now = 0
+
+    def on_arrival(elevator, floor):
+        for t in riding.pop((elevator.id, floor), ()):
+            travels.append(now - t)
+        for t, dest in waiting.pop((elevator.id, floor), ()):
+            waits.append(now - t)
+            riding.setdefault((elevator.id, dest), []).append(now)
+            elevator.add_request(dest)
+
+    system.handler.on_arrival = on_arrival
+    for now in range(ticks):
+        while rnd.random() < rate / (1 + rate):
+            origin, dest = rnd.sample(range(floors), 2)
+            car = system.request_elevator(origin)
+            waiting.setdefault((car.id, origin), []).append((now, dest))
+        system.step()
+    return sum(waits) / max(len(waits), 1), sum(travels) / max(len(travels), 1)
+
+def benchmark(floors=50, num_elevator=4, ticks=20000, rate=0.3):
+    for name, scheduler in (("FIFO", FIFOScheduler), ("LOOK", LookScheduler)):
+        system = ElevatorSystem(num_elevator, scheduler, log=lambda msg: None)
+        wait, travel = simulate_traffic(system, floors, ticks, rate)
+        print(f"{name}: avg wait {wait:7.1f} ticks, avg travel {travel:7.1f} ticks")
+
+def benchmark_dispatch(floors=100, num_elevator=50, ticks=5000, rate=3.0):
+    # Shortest-queue vs ETA dispatch on a large bank of LOOK cars.
+    import time
+    for name, dispatcher in (("shortest queue", ShortestQueueDispatcher()), ("ETA", ETADispatcher())):
+        system = ElevatorSystem(num_elevator, LookScheduler, log=lambda msg: None, dispatcher=dispatcher)
+        start = time.perf_counter()
+        wait, travel = simulate_traffic(system, floors, ticks, rate)
+        elapsed = time.perf_counter() - start
+        print(f"{name:14s}: avg wait {wait:6.1f} ticks, avg travel {travel:6.1f} ticks ({elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    system = ElevatorSystem(2)
+    # Simulate floor requests
+    system.request_elevator(3)
+    system.request_elevator(5)
+    system.request_elevator(1)
+
+    # Simulate time steps to let elevators move
+    for i in range(10):
+        print(f"time: {i}")
+        system.step()
+
+    # LOOK stops at 1 and 2 on its way up to 5, FIFO would go 5 -> 1 -> 2.
+    served = []
+    look = Elevator(0, LookScheduler())
+    for floor in (5, 1, 2):
+        look.add_request(floor)
+    handler = ElevatorEventHandler([look], PhysicalElevator(log=lambda msg: None), log=lambda msg: None,
+                                   on_arrival=lambda e, f: served.append(f))
+    while look.request_queue:
+        handler.handle_requests()
+    assert served == [1, 2, 5]
+
+    # ETA dispatch picks the busy car already heading past the floor over the far idle one.
+    bank = ElevatorSystem(2, LookScheduler, log=lambda msg: None, dispatcher=ETADispatcher())
+    bank.elevators[0].current_floor = 25
+    bank.elevators[1].add_request(9)
+    bank.step()
+    assert bank.request_elevator(10) is bank.elevators[1]
 
-system = ElevatorSystem(2)
-# Simulate floor requests
-system.request_elevator(3)
-system.request_elevator(5)
-system.request_elevator(1)
+    # The index on_move keeps up to date matches one built from scratch.
+    eta = ETADispatcher()
+    busy = ElevatorSystem(8, LookScheduler, log=lambda msg: None, dispatcher=eta)
+    simulate_traffic(busy, 30, 500, 1.0)
+    fresh = ETADispatcher()
+    eta.pick(busy.elevators, 0)  # files the cars that moved since the last call
+    fresh.pick(busy.elevators, 0)
+    assert eta.index == fresh.index
 
-# Simulate time steps to let elevators move
-for i in range(10):
-    print(f"time: {i}")
-    system.step()
\ No newline at end of file
+    benchmark()
+    benchmark_dispatch()
@@ -0,0 +1,263 @@
+"""
+NumPy-backed elevator state for stepping many cars (and many buildings) at once.
+
+Each car is a row: floor, direction and next target are arrays, and pending
+requests are a (cars, floors) matrix of insertion stamps (0 = not pending).
+FIFO picks the oldest stamp, LOOK the nearest pending floor in the direction
+of travel, which is exactly what FIFOScheduler / LookScheduler return: a LOOK
+car never passes a floor it queued behind itself, so "floors ahead" and the
+scheduler's up / down heaps always hold the same floors. step() moves every
+car the way ElevatorEventHandler.handle_requests moves an Elevator.
+
+Buildings are just consecutive blocks of rows, so what-if studies stack
+thousands of buildings into one state and step them together, and
+what_if_sweep spreads groups of configurations over a process pool.
+"""
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from elevator_system import (Direction, Elevator, ElevatorEventHandler, FIFOScheduler,
+                             LookScheduler, PhysicalElevator)
+
+UP, DOWN, IDLE = Direction.up.value, Direction.down.value, Direction.idel.value
+
+
+class VectorElevators:
+    def __init__(self, num_cars, floors, scheduler=LookScheduler):
+        if scheduler not in (FIFOScheduler, LookScheduler):
+            raise ValueError(f"no vectorized version of {scheduler.__name__}")
+        self.floors = floors
+        self.look = scheduler is LookScheduler
+        self.floor = np.zeros(num_cars, dtype=np.int64)
+        self.direction = np.full(num_cars, IDLE, dtype=np.int8)  # Direction values
+        self.target = np.full(num_cars, -1, dtype=np.int64)      # next stop, -1 when idle
+        self.stamp = np.zeros((num_cars, floors), dtype=np.int64)
+        self.seq = 0
+        self._levels = np.arange(floors)
+
+    def add_request(self, car, floor):
+        self.add_requests([car], [floor])
+
+    def add_requests(self, cars, floors):
+        # Same as calling Elevator.add_request for each (car, floor) in order:
+        # floors already pending keep their place in line.
+        cars = np.asarray(cars, dtype=np.int64).ravel()
+        floors = np.asarray(floors, dtype=np.int64).ravel()
+        if not len(cars):
+            return
+        _, first = np.unique(cars * self.floors + floors, return_index=True)
+        first.sort()
+        cars, floors = cars[first], floors[first]
+        new = self.stamp[cars, floors] == 0
+        cars, floors = cars[new], floors[new]
+        self.stamp[cars, floors] = self.seq + 1 + np.arange(len(cars))
+        self.seq += len(cars)
+
+    def pending_counts(self):
+        return np.count_nonzero(self.stamp, axis=1)
+
+    def _next_stops(self):
+        nxt = np.full(len(self.floor), -1, dtype=np.int64)
+        active = np.flatnonzero(self.stamp.any(axis=1))  # idle cars cost nothing below
+        if not len(active):
+            return nxt
+        stamp = self.stamp[active]
+        pending = stamp > 0
+        if not self.look:
+            nxt[active] = np.where(pending, stamp, np.iinfo(np.int64).max).argmin(axis=1)
+            return nxt
+        floor = self.floor[active]
+        cur = floor[:, None]
+        above = pending & (self._levels > cur)
+        below = pending & (self._levels < cur)
+        here = pending[np.arange(len(active)), floor]
+        lowest_above = np.where(above.any(axis=1), above.argmax(axis=1), -1)
+        highest_below = np.where(below.any(axis=1), self.floors - 1 - below[:, ::-1].argmax(axis=1), -1)
+        going_down = self.direction[active] == DOWN
+        ahead = np.where(going_down, highest_below, lowest_above)
+        behind = np.where(going_down, lowest_above, highest_below)
+        nxt[active] = np.where(here, floor, np.where(ahead >= 0, ahead, behind))
+        return nxt
+
+    def step(self):
+        # One tick for every car. Returns (cars, floors) served this tick.
+        nxt = self._next_stops()
+        has = nxt >= 0
+        up = has & (self.floor < nxt)
+        down = has & (self.floor > nxt)
+        direction = self.direction
+        direction[~has] = IDLE
+        direction[up] = UP
+        direction[down] = DOWN
+        self.floor += up
+        self.floor -= down
+        cars = np.flatnonzero(has & ~up & ~down)
+        stops = nxt[cars]
+        self.stamp[cars, stops] = 0
+        direction[cars[~self.stamp[cars].any(axis=1)]] = IDLE
+        self.target = nxt
+        return cars, stops
+
+
+# ---------- What-if studies ----------
+
+def simulate_buildings(floors, num_elevator, rates, scheduler=LookScheduler, ticks=5000, seed=0):
+    # One building per entry of `rates` (chance of a hall call per tick), all
+    # stepped together. Calls go to the car with the fewest pending stops, as
+    # in ElevatorSystem. Returns (avg wait, avg ride) arrays, one per building.
+    rng = np.random.default_rng(seed)
+    rates = np.asarray(rates, dtype=np.float64)
+    n_buildings = len(rates)
+    bank = VectorElevators(n_buildings * num_elevator, floors, scheduler)
+    first_car = np.arange(n_buildings) * num_elevator
+    shape = (n_buildings * num_elevator, floors)
+    waiting, waiting_since = np.zeros(shape, np.int64), np.zeros(shape, np.int64)  # count, sum of call ticks
+    riding, riding_since = np.zeros(shape, np.int64), np.zeros(shape, np.int64)    # count, sum of board ticks
+    wait_total, waits = np.zeros(n_buildings), np.zeros(n_buildings)
+    ride_total, rides = np.zeros(n_buildings), np.zeros(n_buildings)
+
+    for now in range(ticks):
+        calling = np.flatnonzero(rng.random(n_buildings) < rates)
+        if len(calling):
+            origin = rng.integers(0, floors, len(calling))
+            queued = bank.pending_counts().reshape(n_buildings, num_elevator)[calling]
+            cars = first_car[calling] + queued.argmin(axis=1)
+            np.add.at(waiting, (cars, origin), 1)
+            np.add.at(waiting_since, (cars, origin), now)
+            bank.add_requests(cars, origin)
+
+        cars, stops = bank.step()
+        if not len(cars):
+            continue
+        building = cars // num_elevator
+        k = riding[cars, stops]
+        np.add.at(ride_total, building, k * now - riding_since[cars, stops])
+        np.add.at(rides, building, k)
+        riding[cars, stops] = riding_since[cars, stops] = 0
+
+        k = waiting[cars, stops]
+        np.add.at(wait_total, building, k * now - waiting_since[cars, stops])
+        np.add.at(waits, building, k)
+        waiting[cars, stops] = waiting_since[cars, stops] = 0
+        # Boarding passengers pick a destination, any floor but this one.
+        boarders, boarded_at = np.repeat(cars, k), np.repeat(stops, k)
+        dest = rng.integers(0, floors - 1, len(boarders))
+        dest += dest >= boarded_at
+        np.add.at(riding, (boarders, dest), 1)
+        np.add.at(riding_since, (boarders, dest), now)
+        bank.add_requests(boarders, dest)
+
+    return wait_total / np.maximum(waits, 1), ride_total / np.maximum(rides, 1)
+
+def _simulate_job(args):
+    floors, num_elevator, rates, scheduler, ticks, seed = args
+    return simulate_buildings(floors, num_elevator, rates, scheduler, ticks, seed)
+
+def what_if_sweep(configs, ticks=5000, processes=None, chunk=256):
+    # configs: [(floors, num_elevator, rate, scheduler class)]. Configurations
+    # sharing floors / cars / scheduler are stacked into one vectorized run of up
+    # to `chunk` buildings, and runs go to a process pool (processes=1 runs
+    # in this process). Returns [(avg wait, avg ride)] in config order.
+    groups = {}
+    for i, (floors, num_elevator, rate, scheduler) in enumerate(configs):
+        groups.setdefault((floors, num_elevator, scheduler), []).append(i)
+    parts, jobs = [], []
+    for (floors, num_elevator, scheduler), members in groups.items():
+        for start in range(0, len(members), chunk):
+            part = members[start:start + chunk]
+            parts.append(part)
+            jobs.append((floors, num_elevator, [configs[i][2] for i in part], scheduler, ticks, len(jobs)))
+
+    if processes == 1:
+        outputs = map(_simulate_job, jobs)
+    else:
+        pool = ProcessPoolExecutor(processes)
+        outputs = pool.map(_simulate_job, jobs)
+    results = [None] * len(configs)
+    try:
+        for part, (waits, rides) in zip(parts, outputs):
+            for i, wait, ride in zip(part, waits.tolist(), rides.tolist()):
+                results[i] = (wait, ride)
+    finally:
+        if processes != 1:
+            pool.shutdown()
+    return results
+
+
+def check_against_objects(num_cars=20, floors=30, ticks=2000, seed=0):
+    # Feed identical random requests to Elevator objects and to VectorElevators
+    # and compare every car after every tick.
+    rng = np.random.default_rng(seed)
+    for scheduler in (FIFOScheduler, LookScheduler):
+        elevators = [Elevator(eid, scheduler()) for eid in range(num_cars)]
+        served = []
+        handler = ElevatorEventHandler(elevators, PhysicalElevator(log=lambda msg: None),
+                                       log=lambda msg: None, on_arrival=lambda e, f: served.append((e.id, f)))
+        bank = VectorElevators(num_cars, floors, scheduler)
+        for _ in range(ticks):
+            n = rng.integers(0, 4)
+            cars, stops = rng.integers(0, num_cars, n), rng.integers(0, floors, n)
+            for car, floor in zip(cars.tolist(), stops.tolist()):
+                elevators[car].add_request(floor)
+            bank.add_requests(cars, stops)
+            served.clear()
+            handler.handle_requests()
+            cars, stops = bank.step()
+            assert sorted(served) == list(zip(cars.tolist(), stops.tolist()))
+            assert bank.floor.tolist() == [e.current_floor for e in elevators]
+            assert bank.direction.tolist() == [e.direction.value for e in elevators]
+
+
+def benchmark_step(num_cars=10000, floors=50, ticks=200):
+    # Per-tick cost of ElevatorEventHandler vs VectorElevators.step under the
+    # same steady load (a new request for one car in ten every tick).
+    rng = np.random.default_rng(0)
+    load = [(rng.integers(0, num_cars, num_cars // 10), rng.integers(0, floors, num_cars // 10))
+            for _ in range(ticks)]
+    for scheduler in (FIFOScheduler, LookScheduler):
+        elevators = [Elevator(eid, scheduler()) for eid in range(num_cars)]
+        handler = ElevatorEventHandler(elevators, PhysicalElevator(log=lambda msg: None), log=lambda msg: None)
+        objects = 0.0
+        for cars, stops in load:
+            for car, floor in zip(cars.tolist(), stops.tolist()):
+                elevators[car].add_request(floor)
+            start = time.perf_counter()
+            handler.handle_requests()
+            objects += time.perf_counter() - start
+
+        bank = VectorElevators(num_cars, floors, scheduler)
+        vectorized = 0.0
+        for cars, stops in load:
+            bank.add_requests(cars, stops)
+            start = time.perf_counter()
+            bank.step()
+            vectorized += time.perf_counter() - start
+        assert bank.floor.tolist() == [e.current_floor for e in elevators]
+        print(f"{scheduler.__name__:13s} {num_cars:,} cars: objects {objects / ticks * 1000:6.2f} ms/tick, "
+              f"vectorized {vectorized / ticks * 1000:6.2f} ms/tick")
+
+def benchmark_sweep(ticks=2000):
+    # 1,200 building configurations, in one process and across a process pool.
+    configs = [(floors, num_elevator, rate, scheduler)
+               for floors in (20, 50)
+               for num_elevator in (2, 4, 6)
+               for scheduler in (FIFOScheduler, LookScheduler)
+               for rate in np.linspace(0.01, 0.5, 100).tolist()]
+    timings = {}
+    for processes in (1, None):
+        start = time.perf_counter()
+        results = what_if_sweep(configs, ticks, processes)
+        timings[processes] = time.perf_counter() - start
+    best = min(zip(results, configs), key=lambda rc: rc[0][0] if rc[1][2] >= 0.4 else float("inf"))
+    print(f"{len(configs):,} configurations x {ticks} ticks: serial {timings[1]:.1f}s, "
+          f"process pool {timings[None]:.1f}s; best at rate >= 0.4: {best[1][:2]} "
+          f"{best[1][3].__name__} wait {best[0][0]:.1f}")
+
+
+# --- Demo / Test ---
+if __name__ == "__main__":
+    check_against_objects()
+    benchmark_step()
+    benchmark_sweep()
@@ -0,0 +1,211 @@
+"""
+Approximate per-key hit counts and top-k heavy hitters over a sliding window,
+for streams with millions of distinct keys.
+
+Same time model as hit_counter.HitCounter: the window is split into
+window / resolution buckets and timestamps are assumed to be increasing.
+Each bucket owns a count-min sketch; a running aggregate sketch (sum of the
+live buckets) answers queries, and a bucket is subtracted from it when it
+rolls out of the window.
+
+Error bounds (standard count-min guarantees, per query):
+    width = ceil(e / epsilon), depth = ceil(ln(1 / delta))
+    true <= getHits(key) <= true + epsilon * N   with probability >= 1 - delta
+where N is the total number of hits currently in the window. Estimates never
+undercount. Memory is fixed up front at buckets * depth * width 4-byte counters.
+
+🔍 Time/Space:
+Time: O(depth) for hit() and getHits(), O(depth * width) per bucket rollover,
+      O(k * depth) for top_k()
+
+Space: O(window / resolution * depth * width + k)
+"""
+import math
+import operator
+import random
+import time
+from array import array
+
+from hit_counter import HitCounter
+
+
+class SlidingCountMinSketch:
+    def __init__(self, window=300, resolution=10, epsilon=0.001, delta=0.01):
+        self.window = window
+        self.resolution = resolution
+        self.size = math.ceil(window / resolution)
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        cells = self.width * self.depth
+        self.buckets = [array('I', bytes(4 * cells)) for _ in range(self.size)]
+        self.aggregate = array('I', bytes(4 * cells))
+        self.totals = [0] * self.size   # hits per bucket
+        self.total = 0                  # hits in the window, the N of the error bound
+        self.tick = None
+        rnd = random.Random(0x5EED)
+        self.seeds = [(rnd.getrandbits(61) | 1, rnd.getrandbits(61)) for _ in range(self.depth)]
+
+    def memory_bytes(self):
+        return (self.size + 1) * self.depth * self.width * 4
+
+    def _indexes(self, key):
+        # Pairwise-independent row hashes ((a * h + b) mod p) mod width, p = 2**61 - 1.
+        h = hash(key)
+        width = self.width
+        return [row * width + ((a * h + b) % 2305843009213693951) % width
+                for row, (a, b) in enumerate(self.seeds)]
+
+    def _advance(self, tick):
+        if self.tick is None or tick - self.tick >= self.size:
+            cells = self.width * self.depth
+            self.buckets = [array('I', bytes(4 * cells)) for _ in range(self.size)]
+            self.aggregate = array('I', bytes(4 * cells))
+            self.totals = [0] * self.size
+            self.total = 0
+        else:
+            for t in range(self.tick + 1, tick + 1):
+                idx = t % self.size
+                if self.totals[idx]:
+                    old = self.buckets[idx]
+                    self.aggregate = array('I', map(operator.sub, self.aggregate, old))
+                    self.buckets[idx] = array('I', bytes(4 * len(old)))
+                    self.total -= self.totals[idx]
+                    self.totals[idx] = 0
+        self.tick = tick
+
+    def hit(self, key, timestamp, count=1):
+        # Returns the key's updated estimate, saving callers a second lookup.
+        q = timestamp / self.resolution
+        tick = math.floor(q + abs(q) * 1e-15)  # as in HitCounter.hit
+        if self.tick is None or tick > self.tick:
+            self._advance(tick)
+        elif tick <= self.tick - self.size:
+            return self.getHits(key, timestamp)  # late hit that already fell out of the window
+        idx = tick % self.size
+        bucket, aggregate = self.buckets[idx], self.aggregate
+        estimate = None
+        for i in self._indexes(key):
+            bucket[i] += count
+            aggregate[i] += count
+            if estimate is None or aggregate[i] < estimate:
+                estimate = aggregate[i]
+        self.totals[idx] += count
+        self.total += count
+        return estimate
+
+    def getHits(self, key, timestamp):
+        q = timestamp / self.resolution
+        tick = math.floor(q + abs(q) * 1e-15)  # as in HitCounter.hit
+        if self.tick is not None and tick > self.tick:
+            self._advance(tick)
+        aggregate = self.aggregate
+        return min(aggregate[i] for i in self._indexes(key))
+
+    def error_bound(self):
+        # Additive over-estimate that holds with probability >= 1 - delta.
+        return math.e / self.width * self.total
+
+
+class HeavyHitters:
+    # Top-k keys by (estimated) hits in the sliding window. Keeps a bounded
+    # candidate set next to the sketch; a key joins it once its estimate beats
+    # the weakest candidate. Candidates are re-estimated when buckets roll out.
+    def __init__(self, k=10, window=300, resolution=10, epsilon=0.001, delta=0.01):
+        self.k = k
+        self.sketch = SlidingCountMinSketch(window, resolution, epsilon, delta)
+        self.capacity = 2 * k  # slack so keys near the cut-off don't churn
+        self.candidates = {}   # key -> estimate when last seen
+        self.floor = 0         # smallest estimate in a full candidate set
+
+    def _refresh(self, timestamp):
+        sketch = self.sketch
+        self.candidates = {key: sketch.getHits(key, timestamp) for key in self.candidates}
+        self._reset_floor()
+
+    def _reset_floor(self):
+        full = len(self.candidates) >= self.capacity
+        self.floor = min(self.candidates.values()) if full else 0
+
+    def hit(self, key, timestamp):
+        sketch = self.sketch
+        before = sketch.tick
+        estimate = sketch.hit(key, timestamp)
+        if sketch.tick != before:
+            self._refresh(timestamp)
+        candidates = self.candidates
+        if key in candidates:
+            candidates[key] = estimate
+        elif len(candidates) < self.capacity:
+            candidates[key] = estimate
+            self._reset_floor()
+        elif estimate > self.floor:
+            del candidates[min(candidates, key=candidates.get)]
+            candidates[key] = estimate
+            self._reset_floor()
+
+    def getHits(self, key, timestamp):
+        return self.sketch.getHits(key, timestamp)
+
+    def top_k(self, timestamp):
+        # [(key, estimated hits)] for the k heaviest keys, heaviest first.
+        self._refresh(timestamp)
+        ranked = sorted(self.candidates.items(), key=lambda kv: kv[1], reverse=True)
+        return ranked[:self.k]
+
+
+def zipf_stream(n, n_keys, seconds, seed=0):
+    rnd = random.Random(seed)
+    cum, total = [], 0.0
+    for rank in range(1, n_keys + 1):
+        total += 1.0 / rank
+        cum.append(total)
+    keys = rnd.choices(range(n_keys), cum_weights=cum, k=n)
+    return [(f"key-{k}", i * seconds / n) for i, k in enumerate(keys)]
+
+
+def benchmark(n=1000000, n_keys=1000000):
+    stream = zipf_stream(n, n_keys, seconds=900)
+    hh = HeavyHitters(k=20)
+    start = time.perf_counter()
+    for key, ts in stream:
+        hh.hit(key, ts)
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    top = hh.top_k(stream[-1][1])
+    top_ms = (time.perf_counter() - start) * 1000
+    print(f"HeavyHitters: {n / elapsed:,.0f} hits/s, top_k in {top_ms:.1f} ms, "
+          f"{hh.sketch.memory_bytes() / 2**20:.1f} MiB fixed, top 3 {top[:3]}")
+
+
+# --- Demo / Test ---
+if __name__ == "__main__":
+    # Accuracy against one exact HitCounter per key.
+    stream = zipf_stream(100000, 20000, seconds=900, seed=1)
+    hh = HeavyHitters(k=10)
+    exact = {}
+    for key, ts in stream:
+        hh.hit(key, ts)
+        exact.setdefault(key, HitCounter(hh.sketch.window, hh.sketch.resolution)).hit(ts)
+    now = stream[-1][1]
+    truth = {key: counter.getHits(now) for key, counter in exact.items()}
+    bound = hh.sketch.error_bound()
+    within = 0
+    for key, true_hits in truth.items():
+        estimate = hh.getHits(key, now)
+        assert estimate >= true_hits  # count-min never undercounts
+        within += estimate <= true_hits + bound
+    assert within >= 0.99 * len(truth)  # delta = 0.01
+    exact_top = {key for key, _ in sorted(truth.items(), key=lambda kv: kv[1], reverse=True)[:10]}
+    found_top = {key for key, _ in hh.top_k(now)}
+    assert len(exact_top & found_top) >= 9
+
+    tenths = SlidingCountMinSketch(window=1, resolution=0.1)
+    tenths.hit("k", 0.3)  # bucket [0.3, 0.4), not [0.2, 0.3)
+    assert tenths.getHits("k", 1.25) == 1
+    assert tenths.getHits("k", 1.3) == 0
+    epoch = SlidingCountMinSketch(window=100, resolution=0.1)
+    for k in range(17000000000, 17000001000):  # each tenth around 1.7e9 s
+        epoch.hit("k", k / 10)
+    assert list(epoch.totals) == [1] * epoch.size  # one hit per bucket, none a bucket early
+
+    benchmark()
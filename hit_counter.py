@@ -9,28 +9,215 @@ int getHits(int timestamp) Return the number of hits in the past 5 minutes from
 
 You may assume timestamp is increasing with each call.
 
+Generalised: the window length and bucket resolution are configurable
+(e.g. 1 hour at 100 ms buckets) and a running total is kept, so getHits
+never scans the buckets.
+
 
 🔍 Time/Space:
-Time: O(1) for hit(), O(300) for getHits()
+Time: O(1) for getHits(), O(1) amortized for hit() (each bucket is cleared once per rollover)
 
-Space: O(300)
+Space: O(window / resolution)
 """
+import itertools
+import math
+import threading
+import time
+
+
 class HitCounter:
-    def __init__(self):
-        self.time = [0] * 300
-        self.hits = [0] * 300
-    
-    def hit(self, timestamp):
-        idx = timestamp % 300
-        if self.time[idx] != timestamp:
-            self.time[idx] = timestamp
-            self.hits[idx] = 1
+    def __init__(self, window=300, resolution=1):
+        self.window = window
+        self.resolution = resolution
+        self.size = math.ceil(window / resolution)  # number of buckets in the ring
+        self.hits = [0] * self.size
+        self.total = 0      # sum of self.hits, updated on every hit and rollover
+        self.tick = None    # bucket number of the newest timestamp seen
+
+    def _advance(self, tick):
+        # Roll the ring forward to `tick`, dropping buckets that left the window.
+        if self.tick is None or tick - self.tick >= self.size:
+            self.hits = [0] * self.size
+            self.total = 0
         else:
-            self.hits[idx] += 1
-    
+            for t in range(self.tick + 1, tick + 1):
+                idx = t % self.size
+                self.total -= self.hits[idx]
+                self.hits[idx] = 0
+        self.tick = tick
+
+    def hit(self, timestamp, count=1):
+        # Not timestamp // resolution: with a fractional resolution 0.3 // 0.1
+        # is 2.0, so divide and absorb the rounding error before flooring. The
+        # error is a few ulps of the quotient, so the nudge is relative: a fixed
+        # 1e-9 is below one ulp at epoch timestamps (1.7e9 / 0.1 = 1.7e10).
+        q = timestamp / self.resolution
+        tick = math.floor(q + abs(q) * 1e-15)
+        if tick != self.tick:
+            if self.tick is None or tick > self.tick:
+                self._advance(tick)
+            elif tick <= self.tick - self.size:
+                return  # late hit that already fell out of the window
+        self.hits[tick % self.size] += count
+        self.total += count
+
+    def getHits(self, timestamp):
+        q = timestamp / self.resolution
+        tick = math.floor(q + abs(q) * 1e-15)  # as in hit()
+        if self.tick is not None and tick > self.tick:
+            self._advance(tick)
+        return self.total
+
+
+class MultiWindowHitCounter:
+    # Several windows (e.g. last minute / hour / day) fed by one hit() call,
+    # each at its own resolution so long windows stay small.
+    def __init__(self, windows=((60, 1), (3600, 60), (86400, 3600))):
+        self.counters = [HitCounter(window, resolution) for window, resolution in windows]
+
+    def hit(self, timestamp, count=1):
+        for counter in self.counters:
+            counter.hit(timestamp, count)
+
+    def getHits(self, timestamp):
+        # Returns {window length: hits in that window}.
+        return {counter.window: counter.getHits(timestamp) for counter in self.counters}
+
+
+class ConcurrentHitCounter:
+    # Thread-safe counter over a fixed set of HitCounter stripes, each behind
+    # its own lock. Threads are dealt stripes round-robin on their first hit,
+    # so with up to `stripes` threads hit() never contends, and however many
+    # threads come and go the memory stays at `stripes` counters. getHits
+    # merges the stripes.
+    def __init__(self, window=300, resolution=1, stripes=16):
+        self.window = window
+        self.resolution = resolution
+        self.stripes = [(threading.Lock(), HitCounter(window, resolution)) for _ in range(stripes)]
+        self.next_stripe = itertools.count()
+        self.local = threading.local()
+
+    def _stripe(self):
+        stripe = getattr(self.local, 'stripe', None)
+        if stripe is None:
+            stripe = self.local.stripe = self.stripes[next(self.next_stripe) % len(self.stripes)]
+        return stripe
+
+    def hit(self, timestamp, count=1):
+        lock, counter = self._stripe()
+        with lock:
+            counter.hit(timestamp, count)
+
     def getHits(self, timestamp):
         total = 0
-        for i in range(300):
-            if timestamp - self.times[i] < 300:
-                total += self.hits[i]
-        return total
\ No newline at end of file
+        for lock, counter in self.stripes:
+            with lock:
+                total += counter.getHits(timestamp)
+        return total
+
+
+def benchmark(n=3000000, rate=1000000):
+    # n hits arriving at `rate` per second into a 1 hour window of 100 ms buckets.
+    counter = HitCounter(window=3600, resolution=0.1)
+    step = 1 / rate
+    start = time.perf_counter()
+    for i in range(n):
+        counter.hit(i * step)
+    elapsed = time.perf_counter() - start
+    print(f"hit(): {n / elapsed:,.0f} hits/s")
+
+    start = time.perf_counter()
+    for i in range(n):
+        counter.getHits(n * step + i)
+    elapsed = time.perf_counter() - start
+    print(f"getHits(): {n / elapsed:,.0f} calls/s")
+
+
+def benchmark_threads(thread_counts=(1, 2, 4, 8, 16), hits_per_thread=200000):
+    # One HitCounter behind a global lock vs ConcurrentHitCounter stripes.
+    class LockedHitCounter:
+        def __init__(self):
+            self.lock = threading.Lock()
+            self.counter = HitCounter()
+
+        def hit(self, timestamp):
+            with self.lock:
+                self.counter.hit(timestamp)
+
+    for n in thread_counts:
+        for name, counter in (("global lock", LockedHitCounter()), ("striped", ConcurrentHitCounter())):
+            def worker():
+                for i in range(hits_per_thread):
+                    counter.hit(i // 1000)
+            threads = [threading.Thread(target=worker) for _ in range(n)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+            print(f"threads={n:2d} {name:11s} {n * hits_per_thread / elapsed:12,.0f} hits/s")
+
+
+def stress(threads=16, hits_per_thread=50000):
+    # Every hit lands inside the window, so the merged count must be exact.
+    counter = ConcurrentHitCounter()
+
+    def worker(offset):
+        for i in range(hits_per_thread):
+            counter.hit(offset + i % 100)
+
+    workers = [threading.Thread(target=worker, args=(t % 50,)) for t in range(threads)]
+    for w in workers:
+        w.start()
+    readings = []
+    while any(w.is_alive() for w in workers):
+        readings.append(counter.getHits(149))  # concurrent reads must not corrupt stripes
+    for w in workers:
+        w.join()
+    assert counter.getHits(149) == threads * hits_per_thread
+    assert all(r <= threads * hits_per_thread for r in readings)
+
+    # Short-lived threads share the fixed stripes instead of adding new ones.
+    churn = ConcurrentHitCounter(stripes=4)
+    for _ in range(100):
+        t = threading.Thread(target=churn.hit, args=(1,))
+        t.start()
+        t.join()
+    assert len(churn.stripes) == 4 and churn.getHits(1) == 100
+
+
+# --- Demo / Test ---
+if __name__ == "__main__":
+    counter = HitCounter()
+    counter.hit(1)
+    counter.hit(2)
+    counter.hit(3)
+    assert counter.getHits(4) == 3
+    counter.hit(300)
+    assert counter.getHits(300) == 4
+    assert counter.getHits(301) == 3
+
+    fine = HitCounter(window=1, resolution=0.25)
+    for ts in (0.0, 0.3, 0.6, 0.9):
+        fine.hit(ts)
+    assert fine.getHits(1.0) == 3  # bucket [0, 0.25) has rolled out
+
+    tenths = HitCounter(window=1, resolution=0.1)
+    tenths.hit(0.3)  # bucket [0.3, 0.4), not [0.2, 0.3)
+    assert tenths.getHits(1.25) == 1
+    assert tenths.getHits(1.3) == 0
+    epoch = 17000000000  # 1.7e9 s in tenths
+    for k in range(epoch, epoch + 1000):
+        counter = HitCounter(window=1, resolution=0.1)
+        counter.hit(k / 10)
+        assert counter.tick == k
+
+    multi = MultiWindowHitCounter()
+    multi.hit(0)
+    multi.hit(100)
+    assert multi.getHits(130) == {60: 1, 3600: 2, 86400: 2}
+
+    stress()
+    benchmark()
+    benchmark_threads()
@@ -0,0 +1,151 @@
+"""
+Per-key hit counts (e.g. per endpoint / API key) for hundreds of thousands of keys.
+
+Same time model as hit_counter.HitCounter, but every key's ring of buckets is
+one row of a single 2-D NumPy array that shares one clock, so a rollover clears
+a whole column for all keys at once and whole access-log batches are ingested
+with array operations instead of a Python loop per event.
+
+🔍 Time/Space:
+Time: hit_batch() O(n log n) for n events (grouping by key), get_hits() O(k) for k keys,
+      rollover O(keys) per elapsed bucket
+
+Space: O(keys * window / resolution) counters of `dtype`
+"""
+import math
+import time
+
+import numpy as np
+
+
+class KeyedHitCounter:
+    def __init__(self, window=300, resolution=1, initial_keys=1024, dtype=np.uint32):
+        self.window = window
+        self.resolution = resolution
+        self.size = math.ceil(window / resolution)
+        # Column-major so clearing one bucket for every key touches contiguous memory.
+        self.counts = np.zeros((initial_keys, self.size), dtype=dtype, order='F')
+        self.totals = np.zeros(initial_keys, dtype=np.int64)  # running sum of each row
+        self.rows = {}  # key -> row number
+        self.tick = None
+
+    def _rows_for(self, keys, create):
+        # Map an array of keys to row numbers, one dict lookup per distinct key.
+        uniq, inverse = np.unique(np.asarray(keys), return_inverse=True)
+        rows = np.empty(len(uniq), dtype=np.int64)
+        for i, key in enumerate(uniq.tolist()):
+            row = self.rows.get(key)
+            if row is None:
+                if not create:
+                    row = -1
+                else:
+                    row = self.rows[key] = len(self.rows)
+            rows[i] = row
+        if create and len(self.rows) > len(self.totals):
+            self._grow(len(self.rows))
+        return rows[inverse.reshape(-1)]
+
+    def _grow(self, needed):
+        cap = max(needed, 2 * len(self.totals))
+        counts = np.zeros((cap, self.size), dtype=self.counts.dtype, order='F')
+        counts[:len(self.counts)] = self.counts
+        totals = np.zeros(cap, dtype=np.int64)
+        totals[:len(self.totals)] = self.totals
+        self.counts, self.totals = counts, totals
+
+    def _advance(self, tick):
+        # Roll every key's ring forward to `tick`, clearing buckets that left the window.
+        if self.tick is None or tick - self.tick >= self.size:
+            self.counts[:] = 0
+            self.totals[:] = 0
+        elif tick > self.tick:
+            cols = np.arange(self.tick + 1, tick + 1) % self.size
+            self.totals -= self.counts[:, cols].sum(axis=1, dtype=np.int64)
+            self.counts[:, cols] = 0
+        else:
+            return
+        self.tick = tick
+
+    def hit(self, key, timestamp):
+        self.hit_batch([key], [timestamp])
+
+    def hit_batch(self, keys, timestamps):
+        # Record one hit per (keys[i], timestamps[i]). Events older than the
+        # window (relative to the newest timestamp seen) are dropped.
+        q = np.asarray(timestamps, dtype=np.float64) / self.resolution
+        ticks = np.floor(q + np.abs(q) * 1e-15).astype(np.int64)  # as in HitCounter.hit
+        if len(ticks) == 0:
+            return
+        newest = int(ticks.max())
+        if self.tick is None or newest > self.tick:
+            self._advance(newest)
+        rows = self._rows_for(keys, create=True)
+        live = ticks > self.tick - self.size
+        if not live.all():
+            rows, ticks = rows[live], ticks[live]
+        # Flat index into the column-major array: col * n_rows + row.
+        flat = (ticks % self.size) * len(self.totals) + rows
+        cells, n = np.unique(flat, return_counts=True)
+        flat_view = self.counts.reshape(-1, order='F')  # a view, counts is F-contiguous
+        flat_view[cells] += n.astype(self.counts.dtype)
+        self.totals += np.bincount(rows, minlength=len(self.totals))
+
+    def get_hits(self, keys, now):
+        # Hits in the window ending at `now` for each key, 0 for unknown keys.
+        q = now / self.resolution
+        tick = math.floor(q + abs(q) * 1e-15)  # as in HitCounter.hit
+        if self.tick is not None and tick > self.tick:
+            self._advance(tick)
+        rows = self._rows_for(keys, create=False)
+        return np.where(rows >= 0, self.totals[np.maximum(rows, 0)], 0)
+
+
+def benchmark(n_events=1000000, n_keys=200000, seconds=600):
+    rng = np.random.default_rng(0)
+    keys = rng.integers(0, n_keys, n_events)
+    timestamps = np.sort(rng.uniform(0, seconds, n_events))
+    counter = KeyedHitCounter()
+    start = time.perf_counter()
+    counter.hit_batch(keys, timestamps)
+    elapsed = time.perf_counter() - start
+    print(f"hit_batch: {n_events:,} events over {n_keys:,} keys in {elapsed:.2f}s "
+          f"({n_events / elapsed:,.0f} events/s)")
+
+    query = rng.integers(0, n_keys, 100000)
+    start = time.perf_counter()
+    counter.get_hits(query, seconds)
+    elapsed = time.perf_counter() - start
+    print(f"get_hits: {len(query):,} keys in {elapsed * 1000:.1f} ms")
+    print(f"memory: {counter.counts.nbytes / len(counter.rows):,.0f} bytes/key")
+
+
+# --- Demo / Test ---
+if __name__ == "__main__":
+    counter = KeyedHitCounter()
+    counter.hit_batch(["/a", "/b", "/a", "/a"], [1, 2, 3, 300])
+    assert counter.get_hits(["/a", "/b", "/missing"], 300).tolist() == [3, 1, 0]
+    assert counter.get_hits(["/a", "/b"], 302).tolist() == [2, 0]
+
+    tenths = KeyedHitCounter(window=1, resolution=0.1)
+    tenths.hit_batch(["/a"], [0.3])  # bucket [0.3, 0.4), not [0.2, 0.3)
+    assert tenths.get_hits(["/a"], 1.25).tolist() == [1]
+    assert tenths.get_hits(["/a"], 1.3).tolist() == [0]
+    epoch = KeyedHitCounter(window=100, resolution=0.1)
+    epoch.hit_batch(["/a"] * 1000, np.arange(17000000000, 17000001000) / 10)  # each tenth around 1.7e9 s
+    assert (epoch.counts[0] == 1).all()  # one hit per bucket, none a bucket early
+
+    # Matches one HitCounter per key.
+    from hit_counter import HitCounter
+    rng = np.random.default_rng(1)
+    keys = rng.integers(0, 50, 5000)
+    ts = np.sort(rng.integers(0, 1000, 5000))
+    keyed = KeyedHitCounter()
+    exact = {k: HitCounter() for k in range(50)}
+    for lo in range(0, 5000, 500):
+        keyed.hit_batch(keys[lo:lo + 500], ts[lo:lo + 500])
+        for k, t in zip(keys[lo:lo + 500].tolist(), ts[lo:lo + 500].tolist()):
+            exact[k].hit(t)
+    now = int(ts[-1])
+    assert keyed.get_hits(list(range(50)), now).tolist() == [exact[k].getHits(now) for k in range(50)]
+
+    benchmark()
@@ -1,4 +1,13 @@
 import heapq
+import itertools
+import math
+import random
+import threading
+import time
+
+# Size classes, smallest first. A bag fits any locker of its size class or larger.
+SIZES = ['Small', 'Medium', 'Large']
+SIZE_RANK = {size: rank for rank, size in enumerate(SIZES)}
 
 class Locker:
     def __init__(self, locker_id, size):
@@ -9,69 +18,402 @@ class Locker:
 
     def __lt__(self, other):
         return self.locker_id < other.locker_id  # Min-heap based on locker_id
- 
+
+class Bag:
+    def __init__(self, bag_id, size):
+        self.bag_id = bag_id
+        self.size = size
+
 class LockerSystem:
     def __init__(self):
-        self.lockers = {
-            'Small': [],
-            'Medium': [],
-            'Large': []
-        }
+        # Free lockers only, one min-heap per size class. A locker is pushed when
+        # it becomes free and popped when it is taken, so heaps never hold stale entries.
+        self.lockers = {size: [] for size in SIZES}
         self.occupied_lockers = {}  # Dictionary to track occupied lockers
+        self.bag_index = {}  # bag_id -> Locker holding it
 
     def add_locker(self, locker):
         heapq.heappush(self.lockers[locker.size], locker)
 
+    def _fitting_sizes(self, bag_size):
+        return SIZES[SIZE_RANK[bag_size]:]
+
     def find_empty_locker(self, bag_size):
         # Return the smallest available locker for the bag size
-        for size in ['Small', 'Medium', 'Large']:
-            if size >= bag_size:
-                while self.lockers[size] and self.lockers[size][0].occupied:
-                    heapq.heappop(self.lockers[size])  # Remove occupied lockers
-                if self.lockers[size]:
-                    return self.lockers[size][0].locker_id
+        for size in self._fitting_sizes(bag_size):
+            if self.lockers[size]:
+                return self.lockers[size][0].locker_id
         return None
 
     def store_bag(self, bag):
-        for size in ['Small', 'Medium', 'Large']:
-            if size >= bag.size:
-                while self.lockers[size] and self.lockers[size][0].occupied:
-                    heapq.heappop(self.lockers[size])  # Remove occupied lockers
-                if self.lockers[size]:
-                    locker = heapq.heappop(self.lockers[size])  # Get the locker
-                    locker.occupied = True
-                    locker.bag_id = bag.bag_id
-                    self.occupied_lockers[locker.locker_id] = locker  # Track occupied locker
-                    return locker.locker_id
+        # Best fit: the lowest-id free locker in the smallest size class that fits.
+        # A bag id that is already stored is refused, it would strand its locker.
+        if bag.bag_id in self.bag_index:
+            return "No locker available"
+        for size in self._fitting_sizes(bag.size):
+            if self.lockers[size]:
+                locker = heapq.heappop(self.lockers[size])  # Get the locker
+                locker.occupied = True
+                locker.bag_id = bag.bag_id
+                self.occupied_lockers[locker.locker_id] = locker  # Track occupied locker
+                self.bag_index[bag.bag_id] = locker
+                return locker.locker_id
         return "No locker available"
 
+    def find_bag(self, bag_id):
+        locker = self.bag_index.get(bag_id)
+        return locker.locker_id if locker else None
+
     def free_locker(self, locker_id):
         # Free an occupied locker and return it to the available heap
         if locker_id in self.occupied_lockers:
             locker = self.occupied_lockers.pop(locker_id)  # Retrieve and remove from occupied lockers
+            del self.bag_index[locker.bag_id]
             locker.occupied = False
             locker.bag_id = None
             heapq.heappush(self.lockers[locker.size], locker)  # Return to available heap
             return True
         return False
 
+    def free_locker_by_bag(self, bag_id):
+        locker = self.bag_index.get(bag_id)
+        return self.free_locker(locker.locker_id) if locker else False
+
+
+def benchmark(n_lockers=1000000, n_ops=1000000):
+    # Mixed store/free traffic against n_lockers lockers that start half full.
+    rnd = random.Random(0)
+    system = LockerSystem()
+    for i in range(n_lockers):
+        system.add_locker(Locker(i, SIZES[i % 3]))
+    stored = []
+    next_bag = 0
+    for _ in range(n_lockers // 2):
+        system.store_bag(Bag(next_bag, rnd.choice(SIZES)))
+        stored.append(next_bag)
+        next_bag += 1
+
+    start = time.perf_counter()
+    for _ in range(n_ops):
+        if stored and rnd.random() < 0.5:
+            i = rnd.randrange(len(stored))
+            stored[i], stored[-1] = stored[-1], stored[i]
+            system.free_locker_by_bag(stored.pop())
+        elif system.store_bag(Bag(next_bag, rnd.choice(SIZES))) != "No locker available":
+            stored.append(next_bag)
+            next_bag += 1
+    elapsed = time.perf_counter() - start
+    print(f"{n_lockers:,} lockers: {n_ops / elapsed:,.0f} store/free ops/s")
+
+
+# ---------- Multi-site fleet ----------
+
+class LockerSite:
+    def __init__(self, site_id, location):
+        self.site_id = site_id
+        self.location = location  # (x, y)
+        self.system = LockerSystem()
+        self.lock = threading.Lock()  # guards self.system and this site's reservations
+        self.reservations = {}      # reservation_id -> Reservation, unconfirmed holds here
+        self.held_bags = {}         # bag_id -> reservation_id for the same holds
+        self.reservation_heap = []  # (deadline, reservation_id), stale once confirmed/cancelled
+
+class Reservation:
+    def __init__(self, reservation_id, site_id, bag_id, locker_id, deadline):
+        self.reservation_id = reservation_id
+        self.site_id = site_id
+        self.bag_id = bag_id
+        self.locker_id = locker_id
+        self.deadline = deadline
+
+class _IndexShard:
+    # One slice of the fleet-wide id -> site_id lookups.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reservation_site = {}  # reservation_id -> site_id while unconfirmed
+        self.bag_site = {}          # bag_id -> site_id for stored or reserved bags
+
+class LockerFleet:
+    # Many pickup points, each a LockerSystem behind its own lock, so couriers
+    # at different sites never wait on each other. A reservation holds a locker
+    # until it is confirmed or its hold time runs out. Holds live with their
+    # site, and the id -> site lookups are hashed over independently locked
+    # shards, so there is no fleet-wide lock. Lapsed holds are released by
+    # expire_reservations, run periodically by start_sweeper (or by the caller).
+    def __init__(self, clock=time.monotonic, shards=16):
+        self.clock = clock
+        self.sites = {}
+        # size -> site_ids that have at least one free locker of exactly that size
+        self.sites_with_free = {size: set() for size in SIZES}
+        self.shards = [_IndexShard() for _ in range(shards)]
+        self._ids = itertools.count(1)
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def _shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def add_site(self, site_id, location, lockers=()):
+        site = self.sites[site_id] = LockerSite(site_id, location)
+        with site.lock:
+            for locker in lockers:
+                site.system.add_locker(locker)
+            self._refresh_availability(site)
+        return site
+
+    def _refresh_availability(self, site):
+        # Called with site.lock held, keeps the per-size index in step with the site.
+        for size in SIZES:
+            if site.system.lockers[size]:
+                self.sites_with_free[size].add(site.site_id)
+            else:
+                self.sites_with_free[size].discard(site.site_id)
+
+    def _candidates(self, location, bag_size):
+        # Sites with room for bag_size, nearest first. Heap-ordered so the usual
+        # case (the nearest site still has room) costs O(n) rather than a sort.
+        site_ids = set()
+        for size in SIZES[SIZE_RANK[bag_size]:]:
+            site_ids.update(tuple(self.sites_with_free[size]))
+        heap = [(math.dist(location, self.sites[sid].location), sid) for sid in site_ids]
+        heapq.heapify(heap)
+        while heap:
+            yield heapq.heappop(heap)[1]
+
+    def nearest_site(self, location, bag_size):
+        # Closest site that currently has a free locker of size >= bag_size.
+        return next(self._candidates(location, bag_size), None)
+
+    def reserve(self, bag, location, hold=300):
+        # Reserve a locker at the nearest site with room. Returns a Reservation,
+        # or None if no site has room or the bag is already reserved or stored.
+        shard = self._shard(bag.bag_id)
+        with shard.lock:
+            if bag.bag_id in shard.bag_site:
+                return None
+            shard.bag_site[bag.bag_id] = None  # claimed, the site is filled in below
+        reservation = self._reserve(bag, location, hold)
+        if reservation is None:
+            with shard.lock:
+                del shard.bag_site[bag.bag_id]
+        return reservation
+
+    def _reserve(self, bag, location, hold):
+        for site_id in self._candidates(location, bag.size):
+            site = self.sites[site_id]
+            with site.lock:
+                locker_id = site.system.store_bag(bag)
+                self._refresh_availability(site)
+                if locker_id == "No locker available":
+                    continue  # lost the race, try the next site
+                reservation = Reservation(next(self._ids), site_id, bag.bag_id, locker_id, self.clock() + hold)
+                site.reservations[reservation.reservation_id] = reservation
+                site.held_bags[bag.bag_id] = reservation.reservation_id
+                heapq.heappush(site.reservation_heap, (reservation.deadline, reservation.reservation_id))
+                # Indexed before the site lock is dropped, so a sweep can't release it first.
+                shard = self._shard(reservation.reservation_id)
+                with shard.lock:
+                    shard.reservation_site[reservation.reservation_id] = site_id
+                shard = self._shard(bag.bag_id)
+                with shard.lock:
+                    shard.bag_site[bag.bag_id] = site_id
+            return reservation
+        return None
+
+    def _take(self, reservation_id):
+        # Removes an unconfirmed reservation from its site, None if already gone.
+        shard = self._shard(reservation_id)
+        with shard.lock:
+            site_id = shard.reservation_site.pop(reservation_id, None)
+        if site_id is None:
+            return None
+        site = self.sites[site_id]
+        with site.lock:
+            reservation = site.reservations.pop(reservation_id, None)
+            if reservation is not None:
+                del site.held_bags[reservation.bag_id]
+            return reservation
+
+    def confirm(self, reservation_id):
+        # Courier dropped the bag off, the locker stays occupied until pickup.
+        reservation = self._take(reservation_id)
+        if reservation is None:
+            return False
+        if self.clock() > reservation.deadline:
+            self._release(reservation.site_id, reservation.bag_id)
+            return False
+        return True
+
+    def cancel(self, reservation_id):
+        reservation = self._take(reservation_id)
+        if reservation is None:
+            return False
+        self._release(reservation.site_id, reservation.bag_id)
+        return True
+
+    def pickup(self, bag_id):
+        # Only confirmed bags can be picked up, an open hold must be confirmed
+        # or cancelled first.
+        shard = self._shard(bag_id)
+        with shard.lock:
+            site_id = shard.bag_site.get(bag_id)
+        return site_id is not None and self._release(site_id, bag_id, stored_only=True)
+
+    def _release(self, site_id, bag_id, stored_only=False):
+        site = self.sites[site_id]
+        with site.lock:
+            if stored_only and bag_id in site.held_bags:
+                return False
+            freed = site.system.free_locker_by_bag(bag_id)
+            self._refresh_availability(site)
+        shard = self._shard(bag_id)
+        with shard.lock:
+            shard.bag_site.pop(bag_id, None)
+        return freed
+
+    def expire_reservations(self, now=None):
+        # Release every unconfirmed reservation whose hold has run out. Each
+        # site is swept under its own lock; sites with nothing due cost one peek.
+        if now is None:
+            now = self.clock()
+        expired = 0
+        for site in list(self.sites.values()):
+            heap = site.reservation_heap
+            if not heap or heap[0][0] >= now:
+                continue
+            lapsed = []
+            with site.lock:
+                while heap and heap[0][0] < now:
+                    _, reservation_id = heapq.heappop(heap)
+                    reservation = site.reservations.pop(reservation_id, None)
+                    if reservation is not None:
+                        del site.held_bags[reservation.bag_id]
+                        site.system.free_locker_by_bag(reservation.bag_id)
+                        lapsed.append(reservation)
+                self._refresh_availability(site)
+            for reservation in lapsed:
+                shard = self._shard(reservation.reservation_id)
+                with shard.lock:
+                    shard.reservation_site.pop(reservation.reservation_id, None)
+                shard = self._shard(reservation.bag_id)
+                with shard.lock:
+                    shard.bag_site.pop(reservation.bag_id, None)
+            expired += len(lapsed)
+        return expired
+
+    def start_sweeper(self, interval=1.0):
+        # Run expire_reservations every `interval` seconds on a daemon thread.
+        if self._sweeper is None:
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep, args=(interval,), daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self, interval):
+        while not self._stop.wait(interval):
+            self.expire_reservations()
+
+    def stop_sweeper(self):
+        if self._sweeper is not None:
+            self._stop.set()
+            self._sweeper.join()
+            self._sweeper = None
+
+
+def benchmark_fleet(thread_counts=(1, 4, 16), n_sites=200, lockers_per_site=300, ops_per_thread=20000):
+    # Couriers reserve the nearest locker, mostly confirm, sometimes cancel, and
+    # customers pick bags up. Reports fleet operations per second.
+    for n_threads in thread_counts:
+        rnd = random.Random(1)
+        fleet = LockerFleet()
+        locker_ids = itertools.count()
+        for site_id in range(n_sites):
+            lockers = [Locker(next(locker_ids), SIZES[i % 3]) for i in range(lockers_per_site)]
+            fleet.add_site(site_id, (rnd.uniform(0, 100), rnd.uniform(0, 100)), lockers)
+        bag_ids = itertools.count()
+
+        def courier(seed):
+            rnd = random.Random(seed)
+            stored = []
+            for _ in range(ops_per_thread):
+                if stored and rnd.random() < 0.45:
+                    fleet.pickup(stored.pop(rnd.randrange(len(stored))))
+                    continue
+                bag = Bag(next(bag_ids), rnd.choice(SIZES))
+                reservation = fleet.reserve(bag, (rnd.uniform(0, 100), rnd.uniform(0, 100)))
+                if reservation is None:
+                    continue
+                if rnd.random() < 0.9:
+                    fleet.confirm(reservation.reservation_id)
+                    stored.append(bag.bag_id)
+                else:
+                    fleet.cancel(reservation.reservation_id)
+
+        threads = [threading.Thread(target=courier, args=(t,)) for t in range(n_threads)]
+        fleet.start_sweeper()
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        fleet.stop_sweeper()
+        print(f"threads={n_threads:2d} {n_sites} sites: {n_threads * ops_per_thread / elapsed:,.0f} fleet ops/s")
+
+
+if __name__ == "__main__":
+    locker_system = LockerSystem()
+
+    # Add lockers
+    locker_system.add_locker(Locker(1, 'Small'))
+    locker_system.add_locker(Locker(2, 'Medium'))
+    locker_system.add_locker(Locker(3, 'Large'))
+
+    # Store bags
+    print(locker_system.store_bag(Bag(4, 'Small')))  # Assigns locker 1
+    print(locker_system.store_bag(Bag(5, 'Medium')))  # Assigns locker 2
+
+    # Find empty locker
+    print(locker_system.find_empty_locker('Small'))  # Locker 3, the only free one left
+
+    # Free locker
+    locker_system.free_locker(1)  # Frees locker 1
 
-locker_system = LockerSystem()
+    # Find empty locker again
+    print(locker_system.find_empty_locker('Small'))  # Locker 1 is now available
 
-# Add lockers
-locker_system.add_locker(Locker(1, 'Small'))
-locker_system.add_locker(Locker(2, 'Medium'))
-locker_system.add_locker(Locker(3, 'Large'))
+    # Retrieve by bag id
+    assert locker_system.find_bag(5) == 2
+    assert locker_system.free_locker_by_bag(5) and locker_system.find_bag(5) is None
 
-# Store bags
-print(locker_system.store_bag(Locker(4, 'Small')))  # Assigns locker 1
-print(locker_system.store_bag(Locker(5, 'Medium')))  # Assigns locker 2
+    # A bag id already stored is refused rather than given a second locker.
+    first = locker_system.store_bag(Bag(6, 'Small'))
+    assert locker_system.store_bag(Bag(6, 'Small')) == "No locker available"
+    assert locker_system.free_locker_by_bag(6) and locker_system.find_empty_locker('Small') == first
 
-# Find empty locker
-print(locker_system.find_empty_locker('Small'))  # None, as locker 1 is occupied
+    # Fleet: reservations go to the nearest site with room and lapse if unconfirmed.
+    now = [0.0]
+    fleet = LockerFleet(clock=lambda: now[0])
+    fleet.add_site("near", (0, 0), [Locker(10, 'Small')])
+    fleet.add_site("far", (50, 0), [Locker(20, 'Large')])
+    assert fleet.nearest_site((1, 1), 'Small') == "near"
+    assert fleet.nearest_site((1, 1), 'Medium') == "far"
+    held = fleet.reserve(Bag(100, 'Small'), (1, 1), hold=60)
+    assert held.site_id == "near" and fleet.nearest_site((1, 1), 'Small') == "far"
+    now[0] = 61
+    assert fleet.nearest_site((1, 1), 'Small') == "far"  # lapsed, but held until the next sweep
+    assert not fleet.confirm(held.reservation_id) and fleet.nearest_site((1, 1), 'Small') == "near"
+    held = fleet.reserve(Bag(102, 'Small'), (1, 1), hold=60)
+    now[0] = 122
+    assert fleet.expire_reservations() == 1 and fleet.nearest_site((1, 1), 'Small') == "near"
+    kept = fleet.reserve(Bag(101, 'Small'), (1, 1), hold=60)
+    assert fleet.confirm(kept.reservation_id) and fleet.pickup(101)
 
-# Free locker
-locker_system.free_locker(1)  # Frees locker 1
+    # A bag still on hold can't be picked up, so its locker can't be handed out twice.
+    pending = fleet.reserve(Bag(103, 'Small'), (1, 1), hold=60)
+    assert not fleet.pickup(103)
+    assert fleet.reserve(Bag(104, 'Small'), (1, 1), hold=60).locker_id != pending.locker_id
+    assert fleet.confirm(pending.reservation_id) and fleet.pickup(103)
+    assert fleet.reserve(Bag(104, 'Small'), (1, 1)) is None  # already holds a locker
 
-# Find empty locker again
-print(locker_system.find_empty_locker('Small'))  # Locker 1 is now available
+    benchmark()
+    benchmark_fleet()
@@ -0,0 +1,177 @@
+"""
+Precompiled pricing for pizza_shop orders.
+
+Pizza.get_price re-adds base + size + toppings on every call, and deals such as
+buy_one_get_one_free call it again per pizza. The engine prices each distinct
+item (base, size, topping multiset / drink type) once, gives it an integer id,
+and runs deals on those table prices. Item sums come from the subtotal each
+Order already keeps, and only the deals an edit has made stale are re-run.
+Totals match Order.calculate_total exactly.
+"""
+import random
+import time
+
+from pizza_shop import (Deal, Drink, DrinkType, Order, Pizza, PizzaBase, PizzaSize,
+                        Topping, buy_one_get_one_free)
+
+
+def priced_buy_one_get_one_free(items, prices):
+    # buy_one_get_one_free on precomputed prices, prices[i] is the price of items[i].
+    pizza_prices = [price for item, price in zip(items, prices) if isinstance(item, Pizza)]
+    if len(pizza_prices) < 2:
+        return 0
+    return min(pizza_prices)
+
+
+class PricingEngine:
+    def __init__(self):
+        # Lookup tables for every (base, size) pair and topping, built once.
+        self.base_size_price = {(base, size): base.value + size.value
+                                for base in PizzaBase for size in PizzaSize}
+        self.topping_price = {topping: topping.value for topping in Topping}
+        self.drink_price = {drink: drink.value for drink in DrinkType}
+        self.item_ids = {}  # canonical item signature -> id
+        self.fast_ids = {}  # identity-based key in the item's own topping order -> id
+        self.prices = []    # id -> price
+        # Deal functions with a variant that takes precomputed item prices.
+        self.priced_deals = {buy_one_get_one_free: priced_buy_one_get_one_free}
+
+    def register_priced_deal(self, function, priced_function):
+        self.priced_deals[function] = priced_function
+
+    def _signature(self, item):
+        # Exact types only: a subclass may override get_price, so it is left
+        # to get_price (id -1) like any other unknown item.
+        if type(item) is Pizza:
+            # Topping order doesn't change the price, so key on the multiset.
+            return (item.base, item.size, tuple(sorted(t.name for t in item.toppings)))
+        if type(item) is Drink:
+            return (item.type_,)
+        return None
+
+    def _compute_price(self, item):
+        if type(item) is Pizza:
+            price = self.base_size_price[(item.base, item.size)]
+            for topping in item.toppings:
+                price += self.topping_price[topping]
+            return price
+        return self.drink_price[item.type_]
+
+    def _fast_key(self, item):
+        # Enum members are singletons and Enum.__hash__ runs in Python, so
+        # hashing their ids is the cheap way to key the hot lookup.
+        if type(item) is Pizza:
+            return (id(item.base), id(item.size), *map(id, item.toppings))
+        if type(item) is Drink:
+            return (id(item.type_),)
+        return None
+
+    def item_id(self, item):
+        # Id into self.prices, or -1 for item types the engine doesn't know.
+        key = self._fast_key(item)
+        item_id = self.fast_ids.get(key)
+        if item_id is not None:
+            return item_id
+        signature = self._signature(item)
+        if signature is None:
+            return -1
+        item_id = self.item_ids.get(signature)
+        if item_id is None:
+            item_id = self.item_ids[signature] = len(self.prices)
+            self.prices.append(self._compute_price(item))
+        if key is not None:
+            self.fast_ids[key] = item_id
+        return item_id
+
+    def item_price(self, item):
+        item_id = self.item_id(item)
+        return self.prices[item_id] if item_id >= 0 else item.get_price()
+
+    def price_order(self, order):
+        return self.price_orders([order])[0]
+
+    def item_prices(self, items):
+        # Table price per item, get_price for item types the engine doesn't know.
+        lookup, prices, out = self.fast_ids.get, self.prices, []
+        for item in items:
+            # _fast_key inlined, this loop runs once per item a deal looks at
+            kind = type(item)
+            if kind is Pizza:
+                item_id = lookup((id(item.base), id(item.size), *map(id, item.toppings)))
+            elif kind is Drink:
+                item_id = lookup((id(item.type_),))
+            else:
+                item_id = None
+            if item_id is None:
+                item_id = self.item_id(item)
+            out.append(prices[item_id] if item_id >= 0 else item.get_price())
+        return out
+
+    def apply_deal(self, deal, items):
+        priced = self.priced_deals.get(deal.function)
+        if priced is None:
+            return deal.apply(items)
+        return priced(items, self.item_prices(items))
+
+    def price_orders(self, orders):
+        # Totals for a batch of orders, equal to [o.calculate_total() for o in orders].
+        # Builds on each Order's running subtotal and cached discounts, so only
+        # deals an edit has marked stale are re-run, on table prices.
+        apply_deal = self.apply_deal
+        return [order.calculate_total(apply_deal) for order in orders]
+
+
+def random_orders(n, seed=0):
+    rnd = random.Random(seed)
+    bogo = Deal("Buy one get one free", buy_one_get_one_free)
+    orders = []
+    for _ in range(n):
+        order = Order()
+        for _ in range(rnd.randint(1, 6)):
+            order.add_item(Pizza(rnd.choice(list(PizzaBase)), rnd.choice(list(PizzaSize)),
+                                 rnd.choices(list(Topping), k=rnd.randint(0, 4))))
+        for _ in range(rnd.randint(0, 3)):
+            order.add_item(Drink(rnd.choice(list(DrinkType))))
+        order.add_deal(bogo)
+        orders.append(order)
+    return orders
+
+
+def benchmark(n=20000):
+    # Identical fresh orders for each side, so both pay for every deal once.
+    orders = random_orders(n)
+    start = time.perf_counter()
+    expected = [order.calculate_total() for order in orders]
+    baseline = time.perf_counter() - start
+
+    engine = PricingEngine()
+    orders = random_orders(n)
+    start = time.perf_counter()
+    totals = engine.price_orders(orders)
+    batched = time.perf_counter() - start
+    assert totals == expected
+    print(f"{n:,} orders: calculate_total {baseline * 1000:.1f} ms, "
+          f"price_orders {batched * 1000:.1f} ms ({len(engine.prices)} distinct items)")
+
+
+# --- Demo / Test ---
+if __name__ == "__main__":
+    engine = PricingEngine()
+    order = Order()
+    order.add_item(Pizza(PizzaBase.Regular, PizzaSize.Medium, [Topping.Mushroom, Topping.Cheese]))
+    order.add_item(Pizza(PizzaBase.ThinCrust, PizzaSize.Large, [Topping.Onion]))
+    order.add_item(Drink(DrinkType.SODA))
+    order.add_deal(Deal("Buy one get one free", buy_one_get_one_free))
+    assert engine.price_order(order) == order.calculate_total()
+
+    class GiftPizza(Pizza):
+        def get_price(self):
+            return 0
+
+    gift = Order()
+    gift.add_item(GiftPizza(PizzaBase.Regular, PizzaSize.Large, [Topping.Cheese]))
+    gift.add_item(Drink(DrinkType.SODA))
+    assert engine.item_id(gift.items[0]) == -1
+    assert engine.price_order(gift) == gift.calculate_total() == DrinkType.SODA.value
+
+    benchmark()
@@ -1,4 +1,6 @@
 import enum
+import random
+import time
 
 class PizzaBase(enum.Enum):
     Regular = 1
@@ -35,26 +37,78 @@ class Drink:
     def get_price(self):
         return self.type_.value
         
+# Keeps a running subtotal and per-item-type indexes as the cart changes, and
+# caches each deal's discount. An edit only marks the deals that depend on the
+# edited item's type, so calculate_total re-runs just those, and a deal with
+# declared dependencies is handed only the items of those types.
+# Items and deals must be changed through add_item/remove_item/add_deal.
 class Order:
     def __init__(self):
         self.items = []
         self.deals = []
+        self.subtotal = 0
+        self.items_by_type = {}      # item class -> items of that class
+        self.deals_by_type = {}      # item class -> indexes of deals depending on it
+        self.global_deals = []       # deals without declared dependencies, re-run on every edit
+        self.discounts = []          # cached discount per deal
+        self.discount_total = 0
+        self.dirty = set()           # indexes of deals to re-evaluate
     
+    def _touch(self, item):
+        self.dirty.update(self.global_deals)
+        for cls in type(item).__mro__:
+            self.dirty.update(self.deals_by_type.get(cls, ()))
+
     def add_item(self, item):
         self.items.append(item)
+        self.subtotal += item.get_price()
+        self.items_by_type.setdefault(type(item), []).append(item)
+        self._touch(item)
+
+    def remove_item(self, item):
+        self.items.remove(item)
+        self.subtotal -= item.get_price()
+        self.items_by_type[type(item)].remove(item)
+        self._touch(item)
     
     def add_deal(self, deal):
+        idx = len(self.deals)
         self.deals.append(deal)
+        self.discounts.append(0)
+        if deal.depends_on is None:
+            self.global_deals.append(idx)
+        else:
+            for cls in deal.depends_on:
+                self.deals_by_type.setdefault(cls, []).append(idx)
+        self.dirty.add(idx)
         
-    def calculate_total(self):
-        total = sum(item.get_price() for item in self.items)
-        discount = sum(deal.apply(self.items) for deal in self.deals)
-        return total - discount
+    def deal_items(self, deal):
+        # What the deal is applied to: the whole cart, or with depends_on set,
+        # the items of those classes (and subclasses) from the type index.
+        if deal.depends_on is None:
+            return self.items
+        classes = tuple(deal.depends_on)
+        return [item for cls, items in self.items_by_type.items() if issubclass(cls, classes) for item in items]
+
+    def calculate_total(self, apply_deal=None):
+        # apply_deal(deal, items) -> discount lets a caller evaluate deals its
+        # own way (pizza_pricing prices them from a table), default deal.apply.
+        for idx in self.dirty:
+            deal = self.deals[idx]
+            items = self.deal_items(deal)
+            discount = deal.apply(items) if apply_deal is None else apply_deal(deal, items)
+            self.discount_total += discount - self.discounts[idx]
+            self.discounts[idx] = discount
+        self.dirty.clear()
+        return self.subtotal - self.discount_total
 
 class Deal:
-    def __init__(self, description, function):
+    # depends_on: item classes whose edits can change this deal's discount,
+    # None means any edit can. A deal with depends_on only sees those items.
+    def __init__(self, description, function, depends_on=None):
         self.description = description
         self.function = function
+        self.depends_on = depends_on
     def apply(self, items):
         return self.function(items)
         
@@ -64,16 +118,76 @@ def buy_one_get_one_free(items):
         return 0
     cheapest = min(pizza.get_price() for pizza in pizzas)
     return cheapest
+
+def drinks_over(n, off):
+    # Deal factory: `off` off when the order has more than n drinks.
+    def deal(items):
+        return off if sum(isinstance(item, Drink) for item in items) > n else 0
+    return deal
+
+def benchmark(n_items=100, n_deals=50, edits=2000):
+    # Edit-then-total latency on a cart of n_items with n_deals deals, half of
+    # them pizza deals and half drink deals, against recomputing from scratch.
+    rnd = random.Random(0)
+    order = Order()
+    for i in range(n_items):
+        if i % 4:
+            order.add_item(Pizza(rnd.choice(list(PizzaBase)), rnd.choice(list(PizzaSize)),
+                                 rnd.choices(list(Topping), k=2)))
+        else:
+            order.add_item(Drink(rnd.choice(list(DrinkType))))
+    for i in range(n_deals):
+        if i % 2:
+            order.add_deal(Deal(f"BOGO {i}", buy_one_get_one_free, depends_on=(Pizza,)))
+        else:
+            order.add_deal(Deal(f"Drinks {i}", drinks_over(i % 10, 1), depends_on=(Drink,)))
+    order.calculate_total()
+
+    def from_scratch():
+        return (sum(item.get_price() for item in order.items)
+                - sum(deal.apply(order.items) for deal in order.deals))
+
+    drink = Drink(DrinkType.SODA)
+    start = time.perf_counter()
+    for i in range(edits):
+        order.add_item(drink) if i % 2 == 0 else order.remove_item(drink)
+        total = order.calculate_total()
+    incremental = (time.perf_counter() - start) / edits
+    assert total == from_scratch()
+
+    start = time.perf_counter()
+    for i in range(edits):
+        order.items.append(drink) if i % 2 == 0 else order.items.remove(drink)
+        from_scratch()
+    full = (time.perf_counter() - start) / edits
+    print(f"edit+total, {n_items} items / {n_deals} deals: incremental {incremental * 1e6:.1f} us, "
+          f"from scratch {full * 1e6:.1f} us")
     
-# Create an order
-order = Order()
-
-# Add items to the order
-order.add_item(Pizza(PizzaBase.Regular, PizzaSize.Medium, [Topping.Mushroom, Topping.Cheese]))
-order.add_item(Pizza(PizzaBase.ThinCrust, PizzaSize.Large, [Topping.Onion]))
-order.add_item(Drink(DrinkType.SODA))
-order.add_deal(Deal("Buy one get one free", buy_one_get_one_free))
-        
-        
-# Calculate total price
-print(f"Total Order Price: ${order.calculate_total():.2f}")
\ No newline at end of file
+if __name__ == "__main__":
+    # Create an order
+    order = Order()
+
+    # Add items to the order
+    order.add_item(Pizza(PizzaBase.Regular, PizzaSize.Medium, [Topping.Mushroom, Topping.Cheese]))
+    order.add_item(Pizza(PizzaBase.ThinCrust, PizzaSize.Large, [Topping.Onion]))
+    order.add_item(Drink(DrinkType.SODA))
+    order.add_deal(Deal("Buy one get one free", buy_one_get_one_free, depends_on=(Pizza,)))
+
+
+    # Calculate total price
+    print(f"Total Order Price: ${order.calculate_total():.2f}")
+
+    # Edits keep the total current
+    cola = Drink(DrinkType.SODA)
+    order.add_item(cola)
+    assert order.calculate_total() == 11
+    order.remove_item(cola)
+    assert order.calculate_total() == 9
+
+    # A deal declaring its item types gets just those items.
+    seen = []
+    order.add_deal(Deal("Count pizzas", lambda items: seen.append(len(items)) or 0, depends_on=(Pizza,)))
+    order.calculate_total()
+    assert seen == [2]
+
+    benchmark()
@@ -15,8 +15,148 @@ Was asked to design api too:
 User will see list of coupons available and Vouchers;
 Admin can delete/ create , activate or disable coupons etc.
 """
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Optional 
+from decimal import Decimal
+from typing import Any, Callable, List, Dict, Optional, Tuple
+import operator
+import random
+import re
+import threading
+import time
+
+import numpy as np
+
+
+# Rule DSL: comparisons of context attributes against literals, combined with
+# and / or / not and parentheses, e.g. "age > 18 and cart_value > 1000" or
+# "tier == 'gold' or (age >= 60 and not member == false)". A rule is parsed
+# and compiled to a closure once; an attribute missing from the context, or
+# of the wrong type for the comparison, makes that comparison false.
+_TOKEN = re.compile(r"""\s*(?:(?P<num>-?\d+(?:\.\d+)?)|(?P<str>'[^']*'|"[^"]*")"""
+                    r"""|(?P<op>>=|<=|==|!=|>|<)|(?P<paren>[()])|(?P<name>[A-Za-z_]\w*))""")
+_OPS = {'>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+        '==': operator.eq, '!=': operator.ne}
+_LITERALS = {'true': True, 'false': False}
+_MISSING = object()
+
+class Rule:
+    def __init__(self, source: str):
+        self.source = source
+        self._tokens = self._tokenize(source)
+        self._pos = 0
+        tree = self._parse_or()
+        if self._pos != len(self._tokens):
+            raise ValueError(f"unexpected {self._tokens[self._pos][1]!r} in rule {source!r}")
+        del self._tokens
+        self.predicate: Callable[[Dict[str, Any]], bool] = self._compile(tree)
+        # Comparisons that must all hold for the rule to match (the top-level
+        # "and" terms), as (attribute, op, value). CouponIndex keys on these.
+        terms = tree[1] if tree[0] == 'and' else [tree]
+        self.conditions: List[Tuple[str, str, Any]] = [t[1:] for t in terms if t[0] == 'cmp']
+
+    def __call__(self, context: Dict[str, Any]) -> bool:
+        return self.predicate(context)
+
+    # --- parsing: or_expr := and_expr ("or" and_expr)*, and so on down ---
+
+    def _tokenize(self, source):
+        tokens, pos = [], 0
+        source = source.rstrip()
+        while pos < len(source):
+            m = _TOKEN.match(source, pos)
+            if not m or m.end() == pos:
+                raise ValueError(f"cannot parse rule {source!r} at {source[pos:]!r}")
+            tokens.append((m.lastgroup, m.group(m.lastgroup)))
+            pos = m.end()
+        return tokens
+
+    def _peek(self):
+        return self._tokens[self._pos] if self._pos < len(self._tokens) else (None, None)
+
+    def _take(self):
+        token = self._peek()
+        if token[0] is None:
+            raise ValueError(f"rule {self.source!r} ends early")
+        self._pos += 1
+        return token
+
+    def _parse_or(self):
+        terms = [self._parse_and()]
+        while self._peek() == ('name', 'or'):
+            self._pos += 1
+            terms.append(self._parse_and())
+        return terms[0] if len(terms) == 1 else ('or', terms)
+
+    def _parse_and(self):
+        terms = [self._parse_not()]
+        while self._peek() == ('name', 'and'):
+            self._pos += 1
+            terms.append(self._parse_not())
+        return terms[0] if len(terms) == 1 else ('and', terms)
+
+    def _parse_not(self):
+        if self._peek() == ('name', 'not'):
+            self._pos += 1
+            return ('not', self._parse_not())
+        if self._peek() == ('paren', '('):
+            self._pos += 1
+            tree = self._parse_or()
+            if self._take() != ('paren', ')'):
+                raise ValueError(f"missing ')' in rule {self.source!r}")
+            return tree
+        kind, attr = self._take()
+        if kind != 'name' or attr in ('and', 'or', 'not'):
+            raise ValueError(f"expected an attribute name, got {attr!r} in rule {self.source!r}")
+        kind, op = self._take()
+        if kind != 'op':
+            raise ValueError(f"expected a comparison after {attr!r} in rule {self.source!r}")
+        kind, text = self._take()
+        if kind == 'num':
+            value = float(text) if '.' in text else int(text)
+        elif kind == 'str':
+            value = text[1:-1]
+        elif kind == 'name' and text in _LITERALS:
+            value = _LITERALS[text]
+        else:
+            raise ValueError(f"expected a literal after {attr} {op} in rule {self.source!r}")
+        return ('cmp', attr, op, value)
+
+    # --- compiling the tree to closures ---
+
+    def _compile(self, tree):
+        kind = tree[0]
+        if kind == 'cmp':
+            _, attr, op, value = tree
+            compare = _OPS[op]
+
+            def predicate(context):
+                actual = context.get(attr, _MISSING)
+                if actual is _MISSING:
+                    return False
+                try:
+                    return compare(actual, value)
+                except TypeError:
+                    return False
+            return predicate
+        if kind == 'not':
+            inner = self._compile(tree[1])
+            return lambda context: not inner(context)
+        terms = [self._compile(t) for t in tree[1]]
+        if kind == 'and':
+            def predicate(context):
+                for term in terms:
+                    if not term(context):
+                        return False
+                return True
+        else:
+            def predicate(context):
+                for term in terms:
+                    if term(context):
+                        return True
+                return False
+        return predicate
+
 
 # Coupon Class
 class Coupon:
@@ -26,23 +166,202 @@ class Coupon:
         discount: float, 
         usage_limit: int, 
         expiry_date: datetime, 
-        is_active: bool
+        is_active: bool,
+        rule: Optional[str] = None,
+        per_user_limit: Optional[int] = None
     ):
         self.code = code
         self.discount = discount
         self.expiry_date = expiry_date
         self.usage_limit = usage_limit
-        self.usage_count = 0  # Total times the coupon is used
+        self._usage_count = 0  # Total times the coupon is used, until a service takes over
         self.is_active = is_active
+        self.rule = Rule(rule) if rule else None  # compiled once, here
+        self.per_user_limit = per_user_limit  # enforced by RedemptionService
+        self.lock = threading.Lock()  # makes apply()'s check-and-increment atomic
+        self.service: Optional["RedemptionService"] = None  # set by RedemptionService.add
 
-    def is_valid(self):
-        return self.is_active and self.usage_count < self.usage_limit and datetime.now() < self.expiry_date
-    
-    def apply(self, cart_value):
-        if self.is_valid():
-            self.usage_count += 1
-            return cart_value - (cart_value * self.discount / 100)
-        return None
+    @property
+    def usage_count(self) -> int:
+        # Once registered with a RedemptionService its counters are the only count.
+        if self.service is not None:
+            return self.service.used(self.code)
+        return self._usage_count
+
+    @usage_count.setter
+    def usage_count(self, value: int):
+        self._usage_count = value
+
+    def is_valid(self, now: Optional[datetime] = None):
+        now = now or datetime.now()
+        return self.is_active and self.usage_count < self.usage_limit and now < self.expiry_date
+
+    def matches(self, context: Dict[str, Any]) -> bool:
+        return self.rule is None or self.rule.predicate(context)
+
+    def is_eligible(self, context: Dict[str, Any], now: Optional[datetime] = None) -> bool:
+        return self.is_valid(now) and self.matches(context)
+
+    def apply(self, cart_value, context: Optional[Dict[str, Any]] = None, user_id=None):
+        # context: user attributes for the rule; cart_value is added to it.
+        # A coupon registered with a RedemptionService redeems through it.
+        if self.service is not None:
+            return self.service.redeem(self.code, user_id, cart_value, context)
+        if self.rule is not None:
+            context = dict(context or {})
+            context.setdefault("cart_value", cart_value)
+        if self.rule is not None and not self.rule.predicate(context):
+            return None
+        with self.lock:
+            if not self.is_valid():
+                return None
+            self._usage_count += 1
+        return cart_value - (cart_value * self.discount / 100)
+
+
+class _RuleGroup:
+    # Coupons whose rules require comparisons on the same (kind, attribute)
+    # keys, kind being 'min' (attr > / >= x), 'max' (attr < / <= x) or 'eq'.
+    # Each key keeps one array of thresholds (or value codes) aligned with the
+    # members, so a lookup tests every member's conditions in a few vector
+    # comparisons and only the coupons that pass them all are evaluated.
+    def __init__(self, keys):
+        self.keys = keys
+        self.members: Dict[str, Tuple[Coupon, Dict[tuple, Any]]] = {}
+        self.index = None  # built lazily, dropped on every change
+
+    def _build(self):
+        entries = list(self.members.values())
+        self.coupons = [coupon for coupon, _ in entries]
+        self.index = []
+        for key in self.keys:
+            kind, attr = key
+            if kind == 'eq':
+                codes: Dict[Any, int] = {}
+                column = np.array([codes.setdefault(bounds[key], len(codes)) for _, bounds in entries])
+                self.index.append((kind, attr, column, codes))
+            else:
+                column = np.array([bounds[key] for _, bounds in entries], dtype=np.float64)
+                self.index.append((kind, attr, column, None))
+
+    def candidates(self, context):
+        if self.index is None:
+            self._build()
+        mask = None
+        for kind, attr, column, codes in self.index:
+            value = context.get(attr, _MISSING)
+            if kind == 'eq':
+                code = codes.get(value, -1) if value.__hash__ is not None else -1
+                if code < 0:
+                    return []  # no member tests for this value (or it is missing)
+                passed = column == code
+            elif value is _MISSING:
+                return []  # the comparison is false for every member
+            elif isinstance(value, (int, float, np.integer, np.floating)):
+                passed = column <= value if kind == 'min' else column >= value
+            else:
+                # Decimal, Fraction, ...: float64 can't screen these exactly,
+                # leave the key out and let the full rules decide.
+                continue
+            mask = passed if mask is None else mask & passed
+        coupons = self.coupons
+        if mask is None:
+            return list(coupons)
+        return [coupons[i] for i in np.flatnonzero(mask).tolist()]
+
+class CouponIndex:
+    # Eligibility lookup that only evaluates candidate coupons. Coupons are
+    # grouped by which indexable conditions their rule requires, each group
+    # screens its members against the context's values with its threshold
+    # arrays, and only the survivors have their full rules checked.
+    def __init__(self):
+        self.coupons: Dict[str, Coupon] = {}
+        self.groups: Dict[tuple, _RuleGroup] = {}
+        self.code_group: Dict[str, tuple] = {}
+        self.unindexed: Dict[str, Coupon] = {}  # no usable condition, always checked
+
+    def _bounds(self, coupon):
+        # (kind, attr) -> threshold for the first indexable condition of each key.
+        bounds: Dict[tuple, Any] = {}
+        for attr, op, value in (coupon.rule.conditions if coupon.rule else ()):
+            # Rule literals are int / float; only thresholds float64 holds exactly
+            # are indexed, so the screen never drops a matching coupon.
+            numeric = isinstance(value, (int, float)) and abs(value) <= 2**53
+            if op in ('>', '>=') and numeric:
+                bounds.setdefault(('min', attr), value)
+            elif op in ('<', '<=') and numeric:
+                bounds.setdefault(('max', attr), value)
+            elif op == '==':
+                bounds.setdefault(('eq', attr), value)
+        return bounds
+
+    def add(self, coupon: Coupon):
+        self.remove(coupon.code)
+        self.coupons[coupon.code] = coupon
+        bounds = self._bounds(coupon)
+        if not bounds:
+            self.unindexed[coupon.code] = coupon
+            return
+        keys = tuple(sorted(bounds))
+        group = self.groups.get(keys)
+        if group is None:
+            group = self.groups[keys] = _RuleGroup(keys)
+        group.members[coupon.code] = (coupon, bounds)
+        group.index = None
+        self.code_group[coupon.code] = keys
+
+    def remove(self, code: str) -> Optional[Coupon]:
+        coupon = self.coupons.pop(code, None)
+        self.unindexed.pop(code, None)
+        keys = self.code_group.pop(code, None)
+        if keys is not None:
+            group = self.groups[keys]
+            del group.members[code]
+            group.index = None
+            if not group.members:
+                del self.groups[keys]
+        return coupon
+
+    def eligible(self, context: Dict[str, Any], now: Optional[datetime] = None) -> List[Coupon]:
+        now = now or datetime.now()
+        found = [c for c in self.unindexed.values() if c.is_eligible(context, now)]
+        for group in self.groups.values():
+            found.extend(c for c in group.candidates(context) if c.is_eligible(context, now))
+        return found
+
+
+class CouponBook:
+    # Admin API over the coupons, and the user-facing "what can I use" lookup.
+    def __init__(self):
+        self.index = CouponIndex()
+
+    def create(self, code: str, discount: float, usage_limit: int, expiry_date: datetime,
+               rule: Optional[str] = None, is_active: bool = True) -> Coupon:
+        coupon = Coupon(code, discount, usage_limit, expiry_date, is_active, rule)
+        self.index.add(coupon)
+        return coupon
+
+    def delete(self, code: str) -> bool:
+        return self.index.remove(code) is not None
+
+    def activate(self, code: str) -> bool:
+        return self._set_active(code, True)
+
+    def deactivate(self, code: str) -> bool:
+        return self._set_active(code, False)
+
+    def _set_active(self, code, active):
+        coupon = self.index.coupons.get(code)
+        if coupon is None:
+            return False
+        coupon.is_active = active
+        return True
+
+    def available(self, user: Dict[str, Any], cart_value: float, now: Optional[datetime] = None) -> List[Coupon]:
+        # Coupons this user can apply to a cart of cart_value right now.
+        context = dict(user)
+        context["cart_value"] = cart_value
+        return self.index.eligible(context, now)
 
 
 class Voucher:
@@ -53,6 +372,7 @@ class Voucher:
         self.voucher_type = voucher_type
         self.user_id = user_id
         self.is_redeemed = False
+        self.lock = threading.Lock()
     
     def is_valid(self, user_id):
         
@@ -63,30 +383,346 @@ class Voucher:
         return True
     
     def redeem(self, user_id, cart_value):
-        if self.is_valid(user_id):
+        with self.lock:  # only one of several concurrent redeems may win
+            if not self.is_valid(user_id):
+                return None
             self.is_redeemed = True
-            return cart_value - self.discount
-        return None
+        return cart_value - self.discount
+
+
+class _Shard:
+    # One lock and the slice of redemption state it guards.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.remaining: Dict[str, int] = {}             # coupon code -> uses left in this shard's quota
+        self.user_uses: Dict[str, Dict[Any, int]] = {}  # coupon code -> {user: uses}, users hashed here
+        self.results: "OrderedDict[Any, Tuple[float, Optional[float]]]" = OrderedDict()  # key -> (expires, result), oldest first
+        self.inflight: Dict[Any, threading.Event] = {}  # idempotency key -> set when its result lands
+
+class RedemptionService:
+    # Concurrent coupon redemption.
+    # - The global usage_limit is split into per-shard quotas. A redemption takes
+    #   one unit from its user's shard, or from the next shard that has one,
+    #   locking one shard at a time. The quotas add up to usage_limit, so the
+    #   limit can never be overshot, and threads rarely share a lock.
+    # - Per-user counts live in the user's shard, only for users who redeemed.
+    # - A retried request with the same idempotency key gets the first
+    #   attempt's result instead of redeeming again, even while that attempt
+    #   is still running. Results are kept for idempotency_ttl seconds and at
+    #   most max_keys of them, oldest evicted first.
+    # A registered coupon's usage_count, is_valid() and apply() all go through
+    # the service, so there is a single count of its uses.
+    def __init__(self, shards: int = 16, idempotency_ttl: float = 24 * 3600, max_keys: int = 1000000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.shards = [_Shard() for _ in range(shards)]
+        self.coupons: Dict[str, Coupon] = {}
+        self.idempotency_ttl = idempotency_ttl
+        self.keys_per_shard = max(1, max_keys // shards)
+        self.clock = clock
+
+    def add(self, coupon: Coupon) -> bool:
+        # False if the code is already registered: re-splitting its quota would
+        # wipe the per-user counts that enforce per_user_limit.
+        with coupon.lock:  # no apply() may slip in between reading the count and taking it over
+            if coupon.code in self.coupons or coupon.service is not None:
+                return False
+            self.coupons[coupon.code] = coupon
+            n = len(self.shards)
+            left = max(0, coupon.usage_limit - coupon.usage_count)
+            for i, shard in enumerate(self.shards):
+                with shard.lock:
+                    shard.remaining[coupon.code] = left // n + (i < left % n)
+                    shard.user_uses[coupon.code] = {}
+            coupon.service = self
+        return True
+
+    def used(self, code: str) -> int:
+        coupon = self.coupons[code]
+        return coupon.usage_limit - sum(shard.remaining[code] for shard in self.shards)
+
+    def user_uses(self, code: str, user_id) -> int:
+        return self._shard(user_id).user_uses[code].get(user_id, 0)
+
+    def _shard(self, key) -> _Shard:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def redeem(self, code: str, user_id, cart_value: float, context: Optional[Dict[str, Any]] = None,
+               idempotency_key=None) -> Optional[float]:
+        # Returns the discounted cart value, or None if the coupon can't be used.
+        if idempotency_key is None:
+            return self._redeem(code, user_id, cart_value, context)
+        shard = self._shard(idempotency_key)
+        while True:
+            with shard.lock:
+                stored = shard.results.get(idempotency_key)
+                if stored is not None:
+                    if stored[0] > self.clock():
+                        return stored[1]
+                    del shard.results[idempotency_key]
+                pending = shard.inflight.get(idempotency_key)
+                if pending is None:
+                    done = shard.inflight[idempotency_key] = threading.Event()
+                    break
+            pending.wait()  # the first attempt finishes (or fails), then look again
+        result = None
+        try:
+            result = self._redeem(code, user_id, cart_value, context)
+            now = self.clock()
+            with shard.lock:
+                results = shard.results
+                results[idempotency_key] = (now + self.idempotency_ttl, result)
+                while results and (len(results) > self.keys_per_shard or next(iter(results.values()))[0] <= now):
+                    results.popitem(last=False)
+        finally:
+            with shard.lock:
+                del shard.inflight[idempotency_key]
+            done.set()
+        return result
+
+    def _redeem(self, code, user_id, cart_value, context):
+        coupon = self.coupons.get(code)
+        if coupon is None or not coupon.is_active or datetime.now() >= coupon.expiry_date:
+            return None
+        if coupon.rule is not None:
+            context = dict(context or {})
+            context.setdefault("cart_value", cart_value)
+            if not coupon.rule.predicate(context):
+                return None
+
+        home = hash(user_id) % len(self.shards)
+        limit = coupon.per_user_limit
+        if limit is not None and user_id is None:
+            return None  # a per-user limit needs to know the user
+        if limit is not None:
+            # Claim the per-user use first; it is given back if the coupon is used up.
+            shard = self.shards[home]
+            with shard.lock:
+                uses = shard.user_uses[code]
+                count = uses.get(user_id, 0)
+                if count >= limit:
+                    return None
+                uses[user_id] = count + 1
+        if not self._take_quota(code, home):
+            if limit is not None:
+                with shard.lock:
+                    uses[user_id] -= 1
+                    if not uses[user_id]:
+                        del uses[user_id]
+            return None
+        return cart_value - (cart_value * coupon.discount / 100)
+
+    def _take_quota(self, code, start):
+        shards = self.shards
+        for i in range(len(shards)):
+            shard = shards[(start + i) % len(shards)]
+            with shard.lock:
+                left = shard.remaining[code]
+                if left:
+                    shard.remaining[code] = left - 1
+                    return True
+        return False
+
+
+def stress(threads=32, attempts=3000, usage_limit=5000, per_user_limit=3, n_users=1000,
+           scarce_limit=500, scarce_users=100000):
+    # Threads race to redeem one coupon, retrying some requests with the same
+    # idempotency key. Neither limit may be overshot and no retry may count twice.
+    service = RedemptionService()
+    service.add(Coupon("RACE", 10, usage_limit, datetime(2100, 1, 1), True, per_user_limit=per_user_limit))
+    service.add(Coupon("SCARCE", 10, scarce_limit, datetime(2100, 1, 1), True))
+
+    def race(code, users):
+        wins = [[] for _ in range(threads)]
+
+        def worker(t):
+            rnd = random.Random(t)
+            for i in range(attempts):
+                user = rnd.randrange(users)
+                key = (code, t, i)
+                for _ in range(1 + (rnd.random() < 0.3)):  # 30% of requests are retried
+                    result = service.redeem(code, user, 100, idempotency_key=key)
+                if result is not None:
+                    wins[t].append(user)
+
+        workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return [user for won in wins for user in won]
+
+    winners = race("RACE", n_users)
+    assert len(winners) == service.used("RACE") <= usage_limit
+    # Far more requests than uses: shards run dry and hand their users over to
+    # the others' quotas, and the global limit is met exactly.
+    assert threads * attempts > scarce_limit
+    assert len(race("SCARCE", scarce_users)) == service.used("SCARCE") == scarce_limit
+    assert all(shard.remaining["SCARCE"] == 0 for shard in service.shards)
+    per_user: Dict[int, int] = {}
+    for user in winners:
+        per_user[user] = per_user.get(user, 0) + 1
+    assert max(per_user.values()) <= per_user_limit
+    assert all(service.user_uses("RACE", user) == n for user, n in per_user.items())
+
+    # Plain coupons and vouchers: concurrent callers can't overshoot either.
+    coupon = Coupon("FEW", 10, 100, datetime(2100, 1, 1), True)
+    voucher = Voucher("ONCE", 50, datetime(2100, 1, 1), "Unassigned")
+    results: List[Any] = []
+
+    def spender():
+        for _ in range(50):
+            results.append(coupon.apply(100))
+        results.append(voucher.redeem("anyone", 500))
+
+    workers = [threading.Thread(target=spender) for _ in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    assert coupon.usage_count == 100 and sum(r == 90 for r in results) == 100
+    assert sum(r == 450 for r in results) == 1
+
+
+def benchmark_redemptions(thread_counts=(1, 4, 16), per_thread=50000, shards=16):
+    # Redemptions per second against one coupon with a large global limit.
+    for n_threads in thread_counts:
+        service = RedemptionService(shards)
+        service.add(Coupon("BULK", 5, 10**9, datetime(2100, 1, 1), True, per_user_limit=10**6))
+
+        def worker(t):
+            for i in range(per_thread):
+                service.redeem("BULK", (t, i % 1000), 100, idempotency_key=(t, i))
+
+        workers = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+        start = time.perf_counter()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        elapsed = time.perf_counter() - start
+        print(f"threads={n_threads:2d}: {n_threads * per_thread / elapsed:,.0f} redemptions/s")
     
 
-coupon = Coupon("SAVE10", 10, 5, datetime(2025, 2, 14), True)
-cart_value = 1000
-new_price = coupon.apply(cart_value)
-if new_price:
-    print(f"Coupon Applied! New Price: {new_price}")
-else:
-    print("Coupon Invalid or Expired!")
-
-# Creating a pre-assigned voucher
-preassigned_voucher = Voucher("VIP50", 50, datetime(2025, 2, 14), "PreAssigned", "user123")
-
-# Trying to redeem with correct user
-new_price = preassigned_voucher.redeem("user123", 500)
-if new_price:
-    print(f"Voucher Applied! New Price: {new_price}")
-else:
-    print("Voucher Invalid or Already Redeemed!")
-
-# Trying to redeem with wrong user
-new_price = preassigned_voucher.redeem("user999", 500)
-print("Wrong User Voucher:", "Applied" if new_price else "Failed")
\ No newline at end of file
+def random_rule(rnd: random.Random) -> str:
+    # Targeted campaigns: per-city and per-segment offers, age bands, big-cart deals.
+    shape = rnd.random()
+    if shape < 0.4:
+        return f"city == 'c{rnd.randrange(200)}' and cart_value > {rnd.randint(0, 5000)}"
+    if shape < 0.7:
+        low = rnd.randint(16, 70)
+        return f"segment == {rnd.randrange(50)} and age >= {low} and age < {low + 10}"
+    if shape < 0.85:
+        return f"cart_value > {rnd.randint(5000, 50000)} and not tier == 'silver'"
+    if shape < 0.99:
+        low = rnd.randint(16, 70)
+        return f"age >= {low} and age < {low + 5} and orders > {rnd.randint(0, 100)}"
+    return f"cart_value > {rnd.randint(0, 5000)} or orders > {rnd.randint(50, 100)}"  # not indexable
+
+def benchmark(n_coupons=100000, n_lookups=2000, n_scans=100):
+    # available() latency with 100k rule-based coupons, index vs checking every coupon.
+    rnd = random.Random(0)
+    book = CouponBook()
+    for i in range(n_coupons):
+        book.create(f"C{i}", rnd.randint(5, 50), 1000, datetime(2100, 1, 1), random_rule(rnd))
+    now = datetime.now()
+    lookups = [({"age": rnd.randint(16, 80), "tier": rnd.choice(['silver', 'gold', 'platinum']),
+                 "city": f"c{rnd.randrange(200)}", "segment": rnd.randrange(50),
+                 "orders": rnd.randint(0, 120)}, rnd.randint(0, 6000)) for _ in range(n_lookups)]
+    book.available(*lookups[0], now=now)  # builds the index
+
+    def measure(lookup, lookups):
+        latencies = []
+        for user, cart_value in lookups:
+            start = time.perf_counter()
+            lookup(user, cart_value)
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        return latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+    coupons = list(book.index.coupons.values())
+
+    def scan(user, cart_value):
+        context = dict(user, cart_value=cart_value)
+        return [c for c in coupons if c.is_eligible(context, now)]
+
+    for user, cart_value in lookups[:n_scans]:
+        assert {c.code for c in book.available(user, cart_value, now)} == {c.code for c in scan(user, cart_value)}
+    for name, lookup, n in (("full scan", scan, n_scans),
+                            ("index", lambda u, v: book.available(u, v, now), n_lookups)):
+        p50, p99 = measure(lookup, lookups[:n])
+        print(f"{n_coupons:,} coupons, {name:9s}: p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+
+
+if __name__ == "__main__":
+    coupon = Coupon("SAVE10", 10, 5, datetime(2025, 2, 14), True)
+    cart_value = 1000
+    new_price = coupon.apply(cart_value)
+    if new_price:
+        print(f"Coupon Applied! New Price: {new_price}")
+    else:
+        print("Coupon Invalid or Expired!")
+
+    # Creating a pre-assigned voucher
+    preassigned_voucher = Voucher("VIP50", 50, datetime(2025, 2, 14), "PreAssigned", "user123")
+
+    # Trying to redeem with correct user
+    new_price = preassigned_voucher.redeem("user123", 500)
+    if new_price:
+        print(f"Voucher Applied! New Price: {new_price}")
+    else:
+        print("Voucher Invalid or Already Redeemed!")
+
+    # Trying to redeem with wrong user
+    new_price = preassigned_voucher.redeem("user999", 500)
+    print("Wrong User Voucher:", "Applied" if new_price else "Failed")
+
+    # Rules compile once and gate both apply() and the eligibility lookup.
+    book = CouponBook()
+    book.create("ADULT", 10, 5, datetime(2100, 1, 1), "age > 18 and cart_value > 1000")
+    book.create("GOLD", 20, 5, datetime(2100, 1, 1), "tier == 'gold' or age >= 65")
+    book.create("ALL", 5, 5, datetime(2100, 1, 1))
+    assert {c.code for c in book.available({"age": 30, "tier": "silver"}, 1500)} == {"ADULT", "ALL"}
+    assert {c.code for c in book.available({"age": 70}, 500)} == {"GOLD", "ALL"}
+    book.deactivate("ALL")
+    assert book.available({"age": 17}, 5000) == []
+    assert book.index.coupons["ADULT"].apply(1500, {"age": 30}) == 1350
+    assert book.index.coupons["ADULT"].apply(1500, {"age": 12}) is None
+    # Number types the index can't screen still reach the full rule.
+    assert {c.code for c in book.available({"age": Decimal("30")}, Decimal("1500"))} == {"ADULT"}
+    assert {c.code for c in book.available({"age": np.int64(30)}, 1500)} == {"ADULT"}
+
+    # Redemption service: per-user limit, global limit and idempotent retries.
+    service = RedemptionService(shards=4)
+    service.add(Coupon("TWICE", 10, 3, datetime(2100, 1, 1), True, per_user_limit=2))
+    assert service.redeem("TWICE", "u1", 100, idempotency_key="k1") == 90
+    assert service.redeem("TWICE", "u1", 100, idempotency_key="k1") == 90  # retry, not a second use
+    assert service.redeem("TWICE", "u1", 100) == 90
+    assert service.redeem("TWICE", "u1", 100) is None  # per-user limit
+    assert service.redeem("TWICE", "u2", 100) == 90
+    assert service.redeem("TWICE", "u3", 100) is None  # global limit
+    assert service.used("TWICE") == 3
+    # Registering the code again must not reset its per-user counts.
+    assert not service.add(Coupon("TWICE", 10, 10, datetime(2100, 1, 1), True, per_user_limit=2))
+    assert service.redeem("TWICE", "u1", 100) is None and service.user_uses("TWICE", "u1") == 2
+    # The coupon itself sees the service's count: no extra uses through apply().
+    twice = service.coupons["TWICE"]
+    assert twice.usage_count == 3 and not twice.is_valid() and twice.apply(100, user_id="u4") is None
+    shared = Coupon("SHARED", 10, 2, datetime(2100, 1, 1), True)
+    assert shared.apply(100) == 90
+    service.add(shared)
+    assert service.redeem("SHARED", "u1", 100) == 90 and shared.apply(100) is None
+    assert shared.usage_count == 2 and not shared.is_valid()
+    # Idempotency results expire after their TTL and are bounded in number.
+    now = [0.0]
+    keyed = RedemptionService(shards=1, idempotency_ttl=60, max_keys=2, clock=lambda: now[0])
+    keyed.add(Coupon("KEYS", 10, 100, datetime(2100, 1, 1), True))
+    for key in ("a", "b", "c"):
+        keyed.redeem("KEYS", "u", 100, idempotency_key=key)
+    assert list(keyed.shards[0].results) == ["b", "c"]
+    now[0] = 61
+    keyed.redeem("KEYS", "u", 100, idempotency_key="b")  # expired: counts as a new request
+    assert keyed.used("KEYS") == 4 and list(keyed.shards[0].results) == ["b"]
+
+    stress()
+    benchmark()
+    benchmark_redemptions()
@@ -0,0 +1,328 @@
+"""
+Append-only binary event log for a fleet of vending machines.
+
+Every vend, restock and payment is one fixed-width 32-byte record:
+
+    time f8 | machine u4 | kind u1 | pad | slot u2 | product u2 | pad | quantity i4 | amount i8
+
+after a small file header. Slot and product names are interned to ids, kept
+in a JSON sidecar next to the log. EventLog buffers records and writes them
+out when the buffer fills, or within flush_interval seconds: record() flushes
+a buffer that old, and a background thread flushes one nobody writes to. The reader
+memory-maps the file and views it as a NumPy structured array, so the
+aggregations run chunk by chunk over the mapped pages. No Python object is
+built per event, and memory stays bounded by the chunk size however long
+the log gets.
+"""
+import json
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+VEND, RESTOCK, PAYMENT = 1, 2, 3
+
+HEADER = struct.Struct('<4sHH')  # magic, version, record size
+MAGIC = b'VLOG'
+RECORD = struct.Struct('<dIBxHHxxiq')
+RECORD_DTYPE = np.dtype([('time', '<f8'), ('machine', '<u4'), ('kind', 'u1'), ('_pad', 'u1'),
+                         ('slot', '<u2'), ('product', '<u2'), ('_pad2', '<u2'),
+                         ('quantity', '<i4'), ('amount', '<i8')])
+assert RECORD_DTYPE.itemsize == RECORD.size == 32
+
+
+def _names_path(path):
+    return path + '.names.json'
+
+
+class EventLog:
+    # Writer side. Thread-safe; one writer process per file.
+    def __init__(self, path, buffer_events=4096, flush_interval=1.0, clock=time.time):
+        self.path = path
+        self.clock = clock
+        self.flush_interval = flush_interval
+        self.buffer = bytearray(buffer_events * RECORD.size)
+        self.buffered = 0
+        self.lock = threading.Lock()
+        self.names = {'slot': [], 'product': []}
+        if os.path.exists(_names_path(path)):
+            with open(_names_path(path)) as f:
+                self.names = json.load(f)
+        self.ids = {kind: {name: i for i, name in enumerate(names)} for kind, names in self.names.items()}
+        self.names_dirty = False
+
+        self.file = open(path, 'ab')
+        size = self.file.tell()
+        if size == 0:
+            self.file.write(HEADER.pack(MAGIC, 1, RECORD.size))
+        else:
+            with open(path, 'rb') as f:
+                magic, version, record_size = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC or version != 1 or record_size != RECORD.size:
+                raise ValueError(f"{path} is not a vending event log")
+            torn = (size - HEADER.size) % RECORD.size
+            if torn:  # a crash mid-write left half a record, drop it
+                self.file.truncate(size - torn)
+        self.last_flush = self.clock()
+        self._stop = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+            self._flusher.start()
+
+    def _flush_periodically(self):
+        # Buffered records reach the file even if record() isn't called again.
+        while not self._stop.wait(self.flush_interval):
+            with self.lock:
+                if self.buffered:
+                    self._flush()
+
+    def _intern(self, kind, name):
+        ids = self.ids[kind]
+        i = ids.get(name)
+        if i is None:
+            i = ids[name] = len(self.names[kind])
+            self.names[kind].append(name)
+            self.names_dirty = True
+        return i
+
+    def record(self, kind, machine, slot=0, product=0, quantity=0, amount=0, timestamp=None):
+        # slot / product are ids, see vend() and friends for names.
+        now = self.clock()
+        with self.lock:
+            RECORD.pack_into(self.buffer, self.buffered * RECORD.size,
+                             now if timestamp is None else timestamp, machine, kind, slot, product, quantity, amount)
+            self.buffered += 1
+            if self.buffered * RECORD.size == len(self.buffer) or now - self.last_flush >= self.flush_interval:
+                self._flush()
+
+    def vend(self, machine, slot, product, quantity=1):
+        with self.lock:
+            slot, product = self._intern('slot', slot), self._intern('product', product)
+        self.record(VEND, machine, slot, product, quantity)
+
+    def restock(self, machine, slot, product, quantity):
+        with self.lock:
+            slot, product = self._intern('slot', slot), self._intern('product', product)
+        self.record(RESTOCK, machine, slot, product, quantity)
+
+    def payment(self, machine, amount_cents):
+        self.record(PAYMENT, machine, amount=amount_cents)
+
+    def payments(self, machine, amounts_cents):
+        # One PAYMENT record per amount, written in bulk.
+        events = np.zeros(len(amounts_cents), dtype=RECORD_DTYPE)
+        events['time'] = self.clock()
+        events['machine'] = machine
+        events['kind'] = PAYMENT
+        events['amount'] = amounts_cents
+        self.append_many(events)
+
+    def append_many(self, events):
+        # Bulk path: a RECORD_DTYPE array is written as is.
+        events = np.ascontiguousarray(events, dtype=RECORD_DTYPE)
+        with self.lock:
+            self._flush()
+            self.file.write(events.tobytes())
+
+    def _flush(self):
+        # Called with self.lock held.
+        if self.buffered:
+            self.file.write(memoryview(self.buffer)[:self.buffered * RECORD.size])
+            self.buffered = 0
+        self.file.flush()
+        if self.names_dirty:
+            tmp = _names_path(self.path) + '.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(self.names, f)
+            os.replace(tmp, _names_path(self.path))
+            self.names_dirty = False
+        self.last_flush = self.clock()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        if self._flusher is not None:
+            self._stop.set()
+            self._flusher.join()
+        self.flush()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class EventLogReader:
+    # Streams a log through mmap. Records still in a writer's buffer are not seen.
+    def __init__(self, path, chunk_events=1 << 22):
+        self.path = path
+        self.chunk_events = chunk_events
+        self.file = open(path, 'rb')
+        size = os.fstat(self.file.fileno()).st_size
+        if size < HEADER.size:
+            raise ValueError(f"{path} is not a vending event log")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, record_size = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC or version != 1 or record_size != RECORD.size:
+            raise ValueError(f"{path} is not a vending event log")
+        self.count = (size - HEADER.size) // RECORD.size  # ignores a torn last record
+        self.names = {'slot': [], 'product': []}
+        if os.path.exists(_names_path(path)):
+            with open(_names_path(path)) as f:
+                self.names = json.load(f)
+
+    def __len__(self):
+        return self.count
+
+    def chunks(self):
+        # Zero-copy structured-array views of consecutive records.
+        for start in range(0, self.count, self.chunk_events):
+            n = min(self.chunk_events, self.count - start)
+            yield np.frombuffer(self.map, RECORD_DTYPE, n, HEADER.size + start * RECORD.size)
+
+    def _aggregate(self, key_of, kinds, value, sign=None):
+        # {key: sum of value} over events of the given kinds. key_of maps a chunk
+        # to int64 keys, sign (optional) maps a chunk to +1 / -1 per event.
+        totals = {}
+        for chunk in self.chunks():
+            chunk = chunk[np.isin(chunk['kind'], kinds)]
+            if not len(chunk):
+                continue
+            keys = key_of(chunk)
+            weights = chunk[value].astype(np.int64)
+            if sign is not None:
+                weights *= sign(chunk)
+            lo, hi = int(keys.min()), int(keys.max())
+            if hi - lo < 1 << 22:
+                seen = np.flatnonzero(np.bincount(keys - lo))
+                sums = np.bincount(keys - lo, weights=weights)[seen]
+                keys = seen + lo
+            else:
+                keys, inverse = np.unique(keys, return_inverse=True)
+                sums = np.bincount(inverse, weights=weights)
+            for key, total in zip(keys.tolist(), sums.tolist()):
+                totals[key] = totals.get(key, 0) + int(total)
+        return totals
+
+    def _name(self, kind, i):
+        names = self.names[kind]
+        return names[i] if i < len(names) else i
+
+    def sales_by(self, by='product', value='quantity'):
+        # Units (value='quantity') sold per 'slot', 'product' or 'machine'.
+        totals = self._aggregate(lambda c: c[by].astype(np.int64), [VEND], value)
+        if by == 'machine':
+            return totals
+        return {self._name(by, key): total for key, total in totals.items()}
+
+    def sales_by_time(self, bucket=3600, value='quantity'):
+        # Units sold per time bucket, keyed by the bucket's start time.
+        totals = self._aggregate(lambda c: (c['time'] // bucket).astype(np.int64), [VEND], value)
+        return {key * bucket: total for key, total in sorted(totals.items())}
+
+    def revenue_by_machine(self):
+        # Payment amounts in cents per machine.
+        return self._aggregate(lambda c: c['machine'].astype(np.int64), [PAYMENT], 'amount')
+
+    def stock_levels(self):
+        # {(machine, slot): restocked - sold} from the whole log.
+        totals = self._aggregate(lambda c: c['machine'].astype(np.int64) << 16 | c['slot'],
+                                 [VEND, RESTOCK], 'quantity',
+                                 sign=lambda c: np.where(c['kind'] == RESTOCK, 1, -1))
+        return {(key >> 16, self._name('slot', key & 0xFFFF)): total for key, total in totals.items()}
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+def synthetic_events(n, machines=2000, slots=40, products=12, start=1.7e9, seconds=86400 * 30, seed=0):
+    # n random vend / restock / payment records spread over `seconds`.
+    rng = np.random.default_rng(seed)
+    events = np.zeros(n, dtype=RECORD_DTYPE)
+    events['time'] = np.sort(rng.uniform(start, start + seconds, n))
+    events['machine'] = rng.integers(0, machines, n)
+    events['kind'] = rng.choice([VEND, RESTOCK, PAYMENT], n, p=[0.6, 0.05, 0.35])
+    events['slot'] = rng.integers(0, slots, n)
+    events['product'] = events['slot'] % products
+    events['quantity'] = np.where(events['kind'] == RESTOCK, 40, events['kind'] == VEND)
+    events['amount'] = np.where(events['kind'] == PAYMENT, rng.integers(100, 500, n), 0)
+    return events
+
+
+def benchmark(n=20000000, chunk=1000000, per_event=1000000):
+    # Bulk-write n synthetic events, time per-event record(), then aggregate.
+    # A 100M-event log is 3.2 GB; reads stream it chunk by chunk.
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'fleet.vlog')
+        with EventLog(path) as log:
+            start = time.perf_counter()
+            for i in range(0, n, chunk):
+                log.append_many(synthetic_events(min(chunk, n - i), seed=i))
+            bulk = time.perf_counter() - start
+            start = time.perf_counter()
+            for i in range(per_event):
+                log.record(VEND, i % 2000, i % 40, i % 12, 1)
+            single = time.perf_counter() - start
+
+        reader = EventLogReader(path)
+        timings = []
+        for name, query in (("sales by slot", reader.sales_by), ("sales by hour", reader.sales_by_time),
+                            ("revenue by machine", reader.revenue_by_machine),
+                            ("stock levels", reader.stock_levels)):
+            start = time.perf_counter()
+            query() if name != "sales by slot" else query('slot')
+            timings.append(f"{name} {time.perf_counter() - start:.2f}s")
+        print(f"{len(reader):,} events ({os.path.getsize(path) / 2**20:,.0f} MiB): "
+              f"bulk write {n / bulk:,.0f} events/s, record() {per_event / single:,.0f} events/s")
+        print("  " + ", ".join(timings))
+        reader.close()
+
+
+# --- Demo / Test ---
+if __name__ == "__main__":
+    from vending_machine import CardPayment, Customer, VendingMachine, Water
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'demo.vlog')
+        log = EventLog(path)
+        vm = VendingMachine(5, event_log=log, machine_id=7)
+        vm.restock("A1", 40, Water())
+        customer = Customer(vm)
+        customer.select("A1")
+        customer.select("A1")
+        customer.checkout(CardPayment())
+        vm.checkout_batch([([Water()] * 3, CardPayment()), ([Water()], CardPayment())])
+        log.close()
+
+        reader = EventLogReader(path)
+        assert len(reader) == 6
+        assert reader.sales_by('slot') == {"A1": 2}
+        assert reader.sales_by('product') == {"Water": 2}
+        assert reader.revenue_by_machine() == {7: 160 + 240 + 80}
+        assert reader.stock_levels() == {(7, "A1"): 38}
+        reader.close()
+
+        # A torn tail record from a crash is dropped on reopen.
+        with open(path, 'ab') as f:
+            f.write(b'\0' * 10)
+        EventLog(path).close()
+        assert os.path.getsize(path) == HEADER.size + 6 * RECORD.size
+
+        # An idle log is still flushed within flush_interval.
+        log = EventLog(path, flush_interval=0.05)
+        log.payment(7, 100)
+        time.sleep(0.5)
+        assert os.path.getsize(path) == HEADER.size + 7 * RECORD.size
+        log.close()
+
+    benchmark()
@@ -1,4 +1,9 @@
 from abc import ABC, abstractmethod
+from decimal import Decimal
+import itertools
+import random
+import threading
+import time
 
 # product interface
 
@@ -18,11 +23,18 @@ class Coke(Product):
 
 # Payment Method Interface
 
+CENT = Decimal("0.01")
+
 class Payment(ABC):
     @abstractmethod
     def checkout(self, product):
         pass
 
+    def unit_price(self, product):
+        # checkout() as an exact Decimal, for batch settlement. Not rounded to
+        # cents here: only a cart's total is, as checkout() callers round it.
+        return Decimal(str(self.checkout(product)))
+
 
 class CardPayment(Payment):
     def checkout(self, product):
@@ -35,29 +47,187 @@ class CashPayment(Payment):
 
 # --- Vending Machine Class ---
 
+class Slot:
+    # One product type and how many units of it are left. The lock guards
+    # quantity, held and product, so buyers of different slots never wait on
+    # each other.
+    def __init__(self, product, quantity=0):
+        self.product = product
+        self.quantity = quantity
+        self.held = 0  # units taken out by reservations not yet committed or cancelled
+        self.lock = threading.Lock()
+
 class VendingMachine:
-    def __init__(self, capacity):
-        self.capacity = capacity
-        self.slots = {}
+    # event_log: optional vending_log.EventLog that records vends, restocks
+    # and payments under machine_id.
+    def __init__(self, capacity, event_log=None, machine_id=0):
+        self.capacity = capacity  # number of slots
+        self.event_log = event_log
+        self.machine_id = machine_id
+        self.slots = {}  # idx -> Slot
+        self.slots_lock = threading.Lock()  # guards creating slots
+        self.reservations = {}  # reservation id -> (idx, units)
+        self.reservations_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.price_cache = {}  # payment type -> {product type: unit price * 10**price_places}
+        self.price_places = 0
 
     def add_product(self, idx, product):
-        if len(self.slots) >= self.capacity:
+        return self.restock(idx, 1, product)
+
+    def restock(self, idx, n, product=None):
+        # Add n units to slot idx. product is only needed for a new slot; a slot
+        # holds a single product type, so restocking it with another one fails
+        # unless the slot is empty and no reservation holds units from it.
+        if n < 1:
             return False
-        self.slots[idx] = product
+        slot = self.slots.get(idx)
+        if slot is None:
+            if product is None:
+                return False
+            with self.slots_lock:
+                slot = self.slots.get(idx)
+                if slot is None:
+                    if len(self.slots) >= self.capacity:
+                        return False
+                    slot = self.slots[idx] = Slot(product)
+        with slot.lock:
+            if product is not None and type(product) is not type(slot.product):
+                if slot.quantity or slot.held:
+                    return False
+                slot.product = product
+            slot.quantity += n
+            name = type(slot.product).__name__
+        if self.event_log is not None:
+            self.event_log.restock(self.machine_id, idx, name, n)
         return True
 
+    def stock(self, idx):
+        slot = self.slots.get(idx)
+        return slot.quantity if slot else 0
+
+    def _take(self, idx, n, hold=False):
+        # Atomic check-and-decrement, returns the slot or None if fewer than n
+        # are left. hold: the units stay counted against the slot until released.
+        slot = self.slots.get(idx)
+        if slot is None:
+            return None
+        with slot.lock:
+            if slot.quantity < n:
+                return None
+            slot.quantity -= n
+            if hold:
+                slot.held += n
+        return slot
+
     def order(self, idx):
-        product = self.slots.get(idx)
-        if product:
-            del self.slots[idx]
-        return product
+        slot = self._take(idx, 1)
+        if slot is None:
+            return None
+        if self.event_log is not None:
+            self.event_log.vend(self.machine_id, idx, type(slot.product).__name__)
+        return slot.product
+
+    def reserve(self, idx, n=1):
+        # Hold n units for a cart. Returns a reservation id, or None if out of stock.
+        if self._take(idx, n, hold=True) is None:
+            return None
+        reservation_id = next(self._ids)
+        with self.reservations_lock:
+            self.reservations[reservation_id] = (idx, n)
+        return reservation_id
+
+    def commit(self, reservation_id):
+        # The held units are sold, returns the products (None if unknown).
+        with self.reservations_lock:
+            held = self.reservations.pop(reservation_id, None)
+        if held is None:
+            return None
+        idx, n = held
+        slot = self.slots[idx]
+        with slot.lock:
+            slot.held -= n
+            product = slot.product
+        if self.event_log is not None:
+            self.event_log.vend(self.machine_id, idx, type(product).__name__, n)
+        return [product] * n
+
+    def cancel(self, reservation_id):
+        # Put the held units back into their slot.
+        with self.reservations_lock:
+            held = self.reservations.pop(reservation_id, None)
+        if held is None:
+            return False
+        idx, n = held
+        slot = self.slots[idx]
+        with slot.lock:
+            slot.quantity += n
+            slot.held -= n
+        return True
 
     def checkout(self, products, payment):
         total = 0
         for p in products:
             total += payment.checkout(p)
+        if self.event_log is not None:
+            self.event_log.payment(self.machine_id, round(total * 100))
         return total
 
+    def checkout_batch(self, transactions):
+        # Settle many (products, payment) carts at once. Each (product type,
+        # payment type) unit price is computed once and cached as an exact
+        # integer count of 10**-price_places units, carts are summed exactly
+        # and rounded to cents once per cart. Returns one Decimal total per
+        # cart, each logged as a payment.
+        cache = self.price_cache
+        amounts = {}  # exact total -> (Decimal amount, cents), cart totals repeat a lot
+        totals = []
+        paid = []  # cents per cart, for the event log
+        add_total, add_paid = totals.append, paid.append
+        for products, payment in transactions:
+            prices = cache.get(type(payment))
+            if prices is None:
+                prices = cache[type(payment)] = {}
+            try:
+                total = sum(map(prices.__getitem__, map(type, products)))
+            except KeyError:
+                if self._cache_unit_prices(prices, payment, products):
+                    amounts.clear()  # totals so far were in coarser units
+                total = sum(map(prices.__getitem__, map(type, products)))
+            settled = amounts.get(total)
+            if settled is None:
+                amount = Decimal(total).scaleb(-self.price_places).quantize(CENT)
+                settled = amounts[total] = (amount, int(amount.scaleb(2)))
+            add_total(settled[0])
+            add_paid(settled[1])
+        if self.event_log is not None and paid:
+            self.event_log.payments(self.machine_id, paid)
+        return totals
+
+    def _cache_unit_prices(self, prices, payment, products):
+        # Adds the missing products to prices. Returns True if a unit price had
+        # more decimal places than the cache so far, in which case every cached
+        # price was rescaled to the finer unit.
+        widened = False
+        for product in products:
+            if type(product) not in prices:
+                price = payment.unit_price(product)
+                places = -price.as_tuple().exponent
+                if places > self.price_places:
+                    factor = 10 ** (places - self.price_places)
+                    for cached in self.price_cache.values():
+                        for kind in cached:
+                            cached[kind] *= factor
+                    self.price_places = places
+                    widened = True
+                prices[type(product)] = int(price.scaleb(self.price_places))
+        return widened
+
+    def clear_price_cache(self):
+        # Call after changing a product or payment class's pricing.
+        self.price_cache.clear()
+        self.price_places = 0
+
      
 # --- Customer Class ---
 class Customer:
@@ -75,6 +245,66 @@ class Customer:
     def checkout(self, payment):
         return self.vm.checkout(self.cart, payment)
 
+
+def benchmark_checkout(n_carts=100000):
+    # Nightly settlement of random carts: per-item checkout() vs checkout_batch().
+    class Snack(Product):  # not a whole number of cents once discounted
+        def get_price(self):
+            return 1.99
+
+    rnd = random.Random(0)
+    products, payments = [Water(), Coke(), Snack()], [CardPayment(), CashPayment()]
+    transactions = [([rnd.choice(products) for _ in range(rnd.randint(1, 6))], rnd.choice(payments))
+                    for _ in range(n_carts)]
+    vm = VendingMachine(1)
+    start = time.perf_counter()
+    expected = [vm.checkout(cart, payment) for cart, payment in transactions]
+    per_item = time.perf_counter() - start
+    start = time.perf_counter()
+    totals = vm.checkout_batch(transactions)
+    batched = time.perf_counter() - start
+    assert totals == [Decimal(str(round(total, 2))) for total in expected]
+    print(f"{n_carts:,} carts: per-item {per_item * 1000:.0f} ms, batch {batched * 1000:.0f} ms, "
+          f"settled {sum(totals)}")
+
+def benchmark_purchases(thread_counts=(1, 2, 4, 8), n_slots=40, units=20000):
+    # Threads buy from random slots (a fifth of them through reserve/commit or
+    # cancel) until the machine is empty. Every unit must be sold exactly once.
+    for n_threads in thread_counts:
+        vm = VendingMachine(n_slots)
+        for i in range(n_slots):
+            vm.restock(i, units, Water() if i % 2 else Coke())
+        sold = [0] * n_threads
+
+        def buyer(t):
+            rnd = random.Random(t)
+            open_slots = list(range(n_slots))
+            while open_slots:
+                idx = rnd.choice(open_slots)
+                if rnd.random() < 0.2:
+                    reservation_id = vm.reserve(idx)
+                    if reservation_id is not None and rnd.random() < 0.5:
+                        vm.cancel(reservation_id)
+                        continue
+                    got = reservation_id is not None and vm.commit(reservation_id)
+                else:
+                    got = vm.order(idx)
+                if got:
+                    sold[t] += 1
+                else:
+                    open_slots.remove(idx)
+
+        threads = [threading.Thread(target=buyer, args=(t,)) for t in range(n_threads)]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        assert sum(sold) == n_slots * units  # nothing oversold, nothing lost
+        assert all(slot.quantity == 0 for slot in vm.slots.values())
+        print(f"threads={n_threads}: {sum(sold) / elapsed:,.0f} purchases/s")
+
 # --- Demo / Test ---
 if __name__ == "__main__":
     vm = VendingMachine(5)
@@ -88,4 +318,37 @@ if __name__ == "__main__":
     customer.select("A2")
 
     card = CardPayment()
-    assert abs(customer.checkout(card) - 1.6) < 1e-6  # 0.8 + 0.8
\ No newline at end of file
+    assert abs(customer.checkout(card) - 1.6) < 1e-6  # 0.8 + 0.8
+
+    # Slots hold a quantity: one restock call for a whole case.
+    assert vm.restock("A1", 40, Water()) and vm.stock("A1") == 40
+    assert not vm.restock("A1", 1, Coke())  # a slot holds one product type
+    held = vm.reserve("A1", 30)
+    assert vm.stock("A1") == 10 and vm.reserve("A1", 11) is None
+    assert vm.cancel(held) and vm.stock("A1") == 40
+    assert len(vm.commit(vm.reserve("A1", 40))) == 40 and vm.order("A1") is None
+
+    # Restocking needs at least one unit; an empty slot can switch product
+    # once no reservation holds units from it.
+    assert not vm.restock("A1", 0, Water()) and not vm.restock("A1", -5, Water())
+    vm.restock("A1", 1, Water())
+    pending = vm.reserve("A1")
+    assert vm.stock("A1") == 0 and not vm.restock("A1", 10, Coke())
+    assert vm.cancel(pending) and isinstance(vm.order("A1"), Water)
+    assert vm.restock("A1", 10, Coke()) and isinstance(vm.order("A1"), Coke)
+
+    # Batch settlement is exact: three card-paid waters are 2.40, not 2.4000000000000004.
+    assert vm.checkout_batch([([Water()] * 3, card), ([Coke(), Water()], CashPayment())]) == \
+        [Decimal("2.40"), Decimal("3.00")]
+
+    # Unit prices that aren't whole cents are rounded per cart, not per unit:
+    # three card-paid 1.99 snacks are 3 x 1.592 = 4.776 -> 4.78, as checkout() gives.
+    class Snack(Product):
+        def get_price(self):
+            return 1.99
+
+    assert vm.checkout_batch([([Snack()] * 3, card)]) == [Decimal("4.78")]
+    assert round(vm.checkout([Snack()] * 3, card), 2) == 4.78
+
+    benchmark_purchases()
+    benchmark_checkout()
\ No newline at end of file